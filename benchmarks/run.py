@@ -0,0 +1,149 @@
+# Times every dashboard stage on synthetic data without a Streamlit runtime.
+#
+#   python -m benchmarks.run --rows 10000 1000000 --output bench.json
+#
+# Each stage is run on a fresh call with caching bypassed; wall time and the
+# peak memory traced during the stage are recorded per dataset size. Tracing
+# slows allocations down several times, so the time is taken from an untraced
+# call and the peak from a second, traced call.
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks.synthetic import generate_transactions
+from graphs.ego import ego_html
+from graphs.map import generate_branch_map, generate_map
+from graphs.pie import generate_pie_chart
+from graphs.sankey import generate_sankey
+from graphs.timeline import daily_rollups, preprocess_candlestick_data
+from transformations.accounts import build_accounts
+from transformations.adjacency import build_adjacency, expand_selection
+from transformations.edges import aggregate_edges
+from transformations.geo import build_branches
+from transformations.index import apply_filters, build_filter_index, filter_positions
+from transformations.scoring import score_transactions
+from transformations.summary import account_summary, account_totals, totals_summary
+from transformations.timeindex import build_time_index
+
+DEFAULT_ROWS = [10_000, 1_000_000, 10_000_000]
+
+
+def measure(stage, func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    func(*args, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, {'stage': stage, 'seconds': seconds, 'peak_bytes': peak}
+
+# Function to time each stage on one dataset size. The selection picks the
+# most active accounts, as a hub investigation would.
+
+
+def run_size(n_rows, n_accounts=None, skew=1.0, seed=0, select=20):
+    results = []
+    df, record = measure('generate', generate_transactions,
+                         n_rows, n_accounts=n_accounts, skew=skew, seed=seed)
+    results.append(record)
+
+    index, record = measure('build_filter_index', build_filter_index, df)
+    results.append(record)
+
+    top_accounts = df['Sender Account'].value_counts().index[:select].tolist()
+    selections = {'name': [], 'phone': [], 'account': top_accounts}
+    filtered_df, record = measure('apply_filters', apply_filters, df, index, selections)
+    results.append(record)
+
+    branches, record = measure('build_branches', build_branches, df)
+    results.append(record)
+
+    adjacency, record = measure('build_adjacency', build_adjacency, df)
+    results.append(record)
+
+    _, record = measure('build_time_index', build_time_index, df)
+    results.append(record)
+
+    accounts = np.unique(np.concatenate([
+        filtered_df['Sender Account'].to_numpy(dtype=object),
+        filtered_df['Receiver Account'].to_numpy(dtype=object)]))
+    totals, record = measure('account_totals', account_totals, df)
+    results.append(record)
+
+    dimension = build_accounts(df)
+    positions = filter_positions(index, selections)
+    stages = [
+        ('expand_selection', expand_selection, (adjacency, positions, 3)),
+        ('expand_selection_ordered', expand_selection,
+         (adjacency, positions, 3, 'out', True)),
+        ('daily_rollups', daily_rollups, (df, dimension)),
+        ('score_transactions', score_transactions, (df,)),
+        ('account_summary', account_summary, (df, accounts)),
+        ('totals_summary', totals_summary, (totals, accounts, dimension)),
+        ('aggregate_edges', aggregate_edges, (filtered_df,)),
+        ('generate_pie_chart', generate_pie_chart,
+         (filtered_df, 'Purpose of Transaction', 'Transaction Purposes Distribution')),
+        ('generate_sankey', generate_sankey, (filtered_df,)),
+        ('generate_map', generate_map, (filtered_df,)),
+        ('generate_branch_map', generate_branch_map, (filtered_df, branches)),
+        ('ego_html', ego_html, (filtered_df,)),
+        ('preprocess_candlestick_data', preprocess_candlestick_data, (filtered_df,)),
+    ]
+    for stage, func, args in stages:
+        _, record = measure(stage, func, *args)
+        results.append(record)
+
+    for record in results:
+        record.update(rows=n_rows, filtered_rows=len(filtered_df))
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the dashboard stages')
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS)
+    parser.add_argument('--accounts', type=int, default=None,
+                        help='number of accounts, defaults to rows / 2')
+    parser.add_argument('--skew', type=float, default=1.0,
+                        help='Zipf exponent of account popularity, 0 is uniform')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--select', type=int, default=20,
+                        help='number of hub accounts in the filter selection')
+    parser.add_argument('--output', default='bench.json')
+    args = parser.parse_args(argv)
+
+    results = []
+    for n_rows in args.rows:
+        for record in run_size(n_rows, args.accounts, args.skew, args.seed, args.select):
+            print(f"{record['rows']:>10} {record['stage']:<28} "
+                  f"{record['seconds']:9.3f}s {record['peak_bytes'] / 1024 ** 2:9.1f} MB")
+            results.append(record)
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'parameters': vars(args),
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
+    print(f'Results written to {os.path.abspath(args.output)}')
+
+
+if __name__ == '__main__':
+    main()
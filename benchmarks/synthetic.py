@@ -0,0 +1,157 @@
+import string
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+FIRST_NAMES = [
+    'Emily', 'Tammy', 'Rebecca', 'Justin', 'Travis', 'Shelly', 'Michael', 'Sarah',
+    'David', 'Laura', 'James', 'Maria', 'Robert', 'Linda', 'William', 'Karen',
+    'Daniel', 'Nancy', 'Thomas', 'Lisa', 'Steven', 'Angela', 'Kevin', 'Megan',
+]
+LAST_NAMES = [
+    'Edwards', 'Charles', 'Pierce', 'Hall', 'Banks', 'Morris', 'Smith', 'Johnson',
+    'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Lopez', 'Wilson',
+    'Anderson', 'Taylor', 'Moore', 'Jackson', 'Martin', 'Lee', 'Thompson', 'White',
+]
+ACCOUNT_TYPES = ['Credit', 'Checking', 'Savings', 'Business']
+PURPOSES = ['Salary', 'Purchase', 'Transfer', 'Payment', 'Gift', 'Refund']
+TRANSACTION_TYPES = ['Debit', 'Credit']
+AMOUNTS = np.array([50, 120, 250, 500, 1200, 2500, 5000, 10000, 100000], dtype='float64')
+
+# Branches are spread over the continental US like the sample export
+LAT_RANGE = (25.0, 49.0)
+LON_RANGE = (-124.0, -67.0)
+START = pd.Timestamp('2023-01-01')
+PERIOD_SECONDS = 365 * 24 * 3600
+
+ACCOUNTS_PER_BRANCH = 20
+
+# Function to generate the attributes of every account. Accounts, names and
+# phones are unique; several accounts share a branch.
+
+
+def generate_accounts(n_accounts, rng):
+    letters = np.array(list(string.ascii_uppercase))
+    prefixes = [''.join(row) for row in rng.choice(letters, size=(n_accounts, 4))]
+    # Distinct numbers keep the account and phone categories unique
+    order = rng.permutation(n_accounts)
+    numbers = 10 ** 13 + order * 9973
+    accounts = [f'{prefix}{number}' for prefix, number in zip(prefixes, numbers)]
+
+    # Names get a numeric suffix once the first/last combinations run out
+    names = [
+        f'{FIRST_NAMES[i % len(FIRST_NAMES)]} {LAST_NAMES[(i // len(FIRST_NAMES)) % len(LAST_NAMES)]}'
+        + (f' {i // (len(FIRST_NAMES) * len(LAST_NAMES))}' if i >= len(FIRST_NAMES) * len(LAST_NAMES) else '')
+        for i in rng.permutation(n_accounts)
+    ]
+    digits = 2_000_000_000 + order * 97
+    phones = [f'({d // 10 ** 7:03d}){d // 10 ** 4 % 1000:03d}-{d % 10 ** 4:04d}' for d in digits]
+
+    n_branches = max(1, n_accounts // ACCOUNTS_PER_BRANCH)
+    lat = rng.uniform(*LAT_RANGE, n_branches)
+    lon = rng.uniform(*LON_RANGE, n_branches)
+    branches = pd.unique(np.array([f'{a:.6f}, {b:.6f}' for a, b in zip(lat, lon)]))
+    branch = rng.integers(0, len(branches), n_accounts)
+
+    return pd.DataFrame({
+        'account': accounts,
+        'name': names,
+        'phone': phones,
+        'branch': branches[branch],
+        'branch_code': branch,
+        'type': rng.integers(0, len(ACCOUNT_TYPES), n_accounts),
+        'balance': rng.uniform(100, 10000, n_accounts),
+    })
+
+# Function to draw account positions with Zipf-like popularity. skew=0 is
+# uniform; larger values concentrate traffic on a few hub accounts.
+
+
+def _draw_accounts(n_rows, n_accounts, skew, rng):
+    weights = 1.0 / np.arange(1, n_accounts + 1) ** skew
+    weights /= weights.sum()
+    return rng.choice(n_accounts, size=n_rows, p=weights)
+
+
+def _categorical(codes, categories):
+    return pd.Categorical.from_codes(codes, categories=pd.Index(categories))
+
+# Function to generate a transaction frame in the schema of data/Data.xlsx,
+# with the compact dtypes the dashboard loads
+
+
+def generate_transactions(n_rows, n_accounts=None, skew=1.0, seed=0, accounts=None):
+    rng = np.random.default_rng(seed)
+    if accounts is None:
+        n_accounts = n_accounts or max(10, n_rows // 2)
+        accounts = generate_accounts(n_accounts, rng)
+    n_accounts = len(accounts)
+
+    sender = _draw_accounts(n_rows, n_accounts, skew, rng)
+    receiver = _draw_accounts(n_rows, n_accounts, skew, rng)
+    # Shuffle receivers' popularity so hubs on both sides differ
+    receiver = rng.permutation(n_accounts)[receiver]
+    # No self transfers
+    same = sender == receiver
+    receiver[same] = (receiver[same] + 1) % n_accounts
+
+    amount = AMOUNTS[rng.integers(0, len(AMOUNTS), n_rows)] * \
+        rng.uniform(0.5, 1.5, n_rows).round(2)
+    seconds = np.sort(rng.integers(0, PERIOD_SECONDS, n_rows))
+    balance = accounts['balance'].to_numpy()
+    branch_code = accounts['branch_code'].to_numpy()
+    branches = accounts['branch'].to_numpy()[
+        np.unique(branch_code, return_index=True)[1]]
+    branch_code = np.unique(branch_code, return_inverse=True)[1]
+    ids = [f'{a:016x}-{b:04x}' for a, b in zip(
+        rng.integers(0, 2 ** 63, n_rows), rng.integers(0, 2 ** 16, n_rows))]
+
+    return pd.DataFrame({
+        'ID': ids,
+        'Sender Account': _categorical(sender, accounts['account']),
+        'Sender Account Branch': _categorical(branch_code[sender], branches),
+        'Sender Account Type': _categorical(accounts['type'].to_numpy()[sender], ACCOUNT_TYPES),
+        'Sender Name': _categorical(sender, accounts['name']),
+        'Sender Current Account Balance': balance[sender] + rng.normal(0, 100, n_rows),
+        'Receiver Account': _categorical(receiver, accounts['account']),
+        'Receiver Account Branch': _categorical(branch_code[receiver], branches),
+        'Receiver Account Type': _categorical(accounts['type'].to_numpy()[receiver], ACCOUNT_TYPES),
+        'Receiver Current Account Balance': balance[receiver] + rng.normal(0, 100, n_rows),
+        'Receiver Name': _categorical(receiver, accounts['name']),
+        'Amount': amount,
+        'Currency': _categorical(np.zeros(n_rows, dtype=np.int64), ['USD']),
+        'Date and Time': START + pd.to_timedelta(seconds, unit='s'),
+        'Sender Phone Number': _categorical(sender, accounts['phone']),
+        'Receiver Phone Number': _categorical(receiver, accounts['phone']),
+        'Purpose of Transaction': _categorical(rng.integers(0, len(PURPOSES), n_rows), PURPOSES),
+        'Transaction Type': _categorical(rng.integers(0, len(TRANSACTION_TYPES), n_rows), TRANSACTION_TYPES),
+    })
+
+# Function to write a generated dataset to CSV or Parquet in chunks, so 10M
+# row files can be produced without holding them in memory at once
+
+
+def write_transactions(path, n_rows, n_accounts=None, skew=1.0, seed=0, chunk_rows=1_000_000):
+    rng = np.random.default_rng(seed)
+    n_accounts = n_accounts or max(10, n_rows // 2)
+    accounts = generate_accounts(n_accounts, rng)
+
+    writer = None
+    try:
+        for i, start in enumerate(range(0, n_rows, chunk_rows)):
+            chunk = generate_transactions(
+                min(chunk_rows, n_rows - start), skew=skew, seed=seed + i + 1, accounts=accounts)
+            chunk = chunk.astype({column: str for column in chunk.columns
+                                  if isinstance(chunk[column].dtype, pd.CategoricalDtype)})
+            if path.endswith('.csv'):
+                chunk.to_csv(path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+            else:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
@@ -1,18 +1,68 @@
-import streamlit as st
 from pyvis.network import Network
 import networkx as nx
 
+from transformations.edges import aggregate_edges, prune_edges
+from transformations.scoring import flag_edges
+from utils.cache import chart_cache
+
+# Graphs with more nodes than this are laid out on the server with physics off
+SERVER_LAYOUT_THRESHOLD = 300
+LAYOUT_SCALE = 1000
+FLAGGED_COLOR = '#d62728'
+
+
+# Function to compute node positions once on the server. The spring layout
+# needs scipy for large graphs, fall back to a circular layout without it.
+def server_layout(G):
+    try:
+        positions = nx.spring_layout(G, seed=42)
+    except ImportError:
+        positions = nx.circular_layout(G)
+    scale = LAYOUT_SCALE * max(1.0, (G.number_of_nodes() / 100) ** 0.5)
+    return {node: (float(x) * scale, float(y) * scale) for node, (x, y) in positions.items()}
+
+
+@chart_cache.memoize
+def ego(filtered_df, layout='auto', top_k=None, by='amount', min_amount=None, flagged=None,
+        nodes=None, edges=None):
+    # Nodes and edges aggregated already, e.g. by the database, are used as given
+    if edges is None:
+        nodes, edges = aggregate_edges(filtered_df)
+    nodes, edges, _ = prune_edges(nodes, edges, top_k, by, min_amount)
+    is_flagged = flag_edges(edges, flagged)
 
-@st.cache_resource
-def ego(filtered_df):
     G = nx.Graph()
-    G.add_nodes_from(filtered_df['Sender Name'])
-    G.add_nodes_from(filtered_df['Receiver Name'])
-    edges = [(row['Sender Name'], row['Receiver Name'])
-             for idx, row in filtered_df.iterrows()]
-    G.add_edges_from(edges)
+    G.add_nodes_from(nodes['label'])
+    G.add_edges_from(
+        (sender, receiver, {'title': f'{sender} -> {receiver}: ${amount} ({count} transactions)'})
+        for sender, receiver, amount, count in zip(
+            edges['sender'], edges['receiver'], edges['amount'], edges['count']))
+    # Edges with a flagged transaction are drawn thick and red
+    for sender, receiver in zip(edges['sender'][is_flagged], edges['receiver'][is_flagged]):
+        G.edges[sender, receiver].update(
+            color=FLAGGED_COLOR, width=3,
+            title=G.edges[sender, receiver]['title'] + ' (flagged)')
+
+    use_server_layout = layout == 'server' or (
+        layout == 'auto' and G.number_of_nodes() > SERVER_LAYOUT_THRESHOLD)
+    if use_server_layout:
+        nx.set_node_attributes(G, {
+            node: {'x': x, 'y': y} for node, (x, y) in server_layout(G).items()})
 
     # Create a PyVis network
     g = Network(height='450px', width='100%')
     g.from_nx(G)
+    if use_server_layout:
+        # Nodes keep the precomputed positions, the browser runs no simulation
+        g.toggle_physics(False)
+        g.set_edge_smooth('continuous')
     return g
+
+# Function to render the ego graph to an HTML string in memory
+
+
+@chart_cache.memoize
+def ego_html(filtered_df, layout='auto', top_k=None, by='amount', min_amount=None,
+             flagged=None, nodes=None, edges=None):
+    return ego(filtered_df, layout=layout, top_k=top_k, by=by, min_amount=min_amount,
+               flagged=flagged, nodes=nodes, edges=edges).generate_html()
@@ -1,17 +1,27 @@
-import streamlit as st
-import networkx as nx
+from functools import lru_cache
+
 import plotly.graph_objects as go
 import numpy as np
 
+from transformations.edges import aggregate_edges, prune_edges
+from transformations.geo import DEFAULT_LEVEL, MAP_SCOPES, branch_flows, build_branches, cluster_graph
+from utils.cache import chart_cache
+
 ARROW_COLOR = "#0077b6"
 SENDER_COLOR = "red"
 RECEIVER_COLOR = "#70e000"
+# Line widths are rounded to this step so edges share a handful of traces
+WIDTH_STEP = 0.5
+# Marker sizes of the branch map, scaled by the amount through each cluster
+MIN_MARKER_SIZE = 8
+MAX_MARKER_SIZE = 30
 
 
-@st.cache_data
+# Plain per-process cache, branch strings are cheap to key on
+@lru_cache(maxsize=None)
 def get_coordinates(branch):
     coordinates = branch.split(', ')
-    coordinates = [float(x) for x in coordinates]
+    coordinates = tuple(float(x) for x in coordinates)
     return coordinates
 
 
@@ -55,32 +65,96 @@ def add_arrow_trace(lat, lon, weight, sender, receiver):
     ]
 
 
-def transaction_map(filtered_df):
-    st.subheader('Interactive Map of Transactions')
-    G = nx.DiGraph()
+# Function to pack per-edge point arrays of shape (n, k) into one flat array
+# with a NaN gap after every edge, serialized as null by plotly
+
 
-    sender_branches = set()
-    receiver_branches = set()
+def _with_gaps(points):
+    gap = np.full((points.shape[0], 1), np.nan)
+    return np.hstack([points, gap]).ravel()
 
-    for idx, row in filtered_df.iterrows():
-        sender_coords = get_coordinates(row['Sender Account Branch'])
-        receiver_coords = get_coordinates(row['Receiver Account Branch'])
-        sender_branch = row['Sender Account Branch']
-        receiver_branch = row['Receiver Account Branch']
-        sender = row['Sender Name']
-        receiver = row['Receiver Name']
+# Function to build the lines and arrowheads of all edges in a few traces
 
-        sender_branches.add(sender)
-        receiver_branches.add(receiver)
 
-        if sender not in G:
-            G.add_node(sender, pos=sender_coords)
-        if receiver not in G:
-            G.add_node(receiver, pos=receiver_coords)
+def batched_arrow_traces(lat, lon, weight, sender, receiver):
+    lat = np.asarray(lat, dtype='float64')
+    lon = np.asarray(lon, dtype='float64')
+    weight = np.asarray(weight, dtype='float64')
+    log_weight = np.log1p(weight / 1000)
+
+    # Calculate the direction vectors, shape (n, 2) as (lon, lat)
+    A = np.column_stack([lon[:, 0], lat[:, 0]])
+    B = np.column_stack([lon[:, 1], lat[:, 1]])
+    v = B - A
+    norm = np.linalg.norm(v, axis=1, keepdims=True)
+    w = np.divide(v, norm, out=np.zeros_like(v), where=norm > 0)
+    u = np.column_stack([-v[:, 1], v[:, 0]])  # Perpendicular vectors
+
+    # Arrowhead parameters
+    arrow_length = (log_weight * 0.2)[:, None]
+    arrow_width = arrow_length * 0.05
 
-        G.add_edge(sender, receiver, weight=row['Amount'])
+    # Calculate arrowhead points
+    P = B - arrow_length * w
+    S = P - arrow_width * u
+    T = P + arrow_width * u
+
+    text = np.array([f'{s} -> {r}: ${a}' for s, r, a in zip(sender, receiver, weight)],
+                    dtype=object)
+    widths = np.maximum(np.round(log_weight / WIDTH_STEP), 1) * WIDTH_STEP
+
+    traces = []
+    for width in np.unique(widths):
+        bucket = widths == width
+        line_text = np.column_stack(
+            [text[bucket], text[bucket], np.full(bucket.sum(), None)]).ravel()
+        traces.append(go.Scattermapbox(
+            lat=_with_gaps(lat[bucket]),
+            lon=_with_gaps(lon[bucket]),
+            mode='lines',
+            line=dict(width=width, color=ARROW_COLOR),
+            text=line_text,
+            hoverinfo='text'
+        ))
 
-    pos = nx.get_node_attributes(G, 'pos')
+    traces.append(go.Scattermapbox(
+        lon=_with_gaps(np.column_stack([S[:, 0], T[:, 0], B[:, 0], S[:, 0]])),
+        lat=_with_gaps(np.column_stack([S[:, 1], T[:, 1], B[:, 1], S[:, 1]])),
+        mode='lines',
+        fill='toself',
+        fillcolor=ARROW_COLOR,
+        line_color=ARROW_COLOR,
+        hoverinfo='skip'
+    ))
+    return traces
+
+
+@chart_cache.memoize
+def generate_map(filtered_df, batched=True, top_k=None, by='amount', min_amount=None,
+                 accounts=None):
+    if accounts is None:
+        # Each person is placed at the branch of the row they first appear in
+        nodes, edges = aggregate_edges(filtered_df, node_attributes={
+            'branch': ('Sender Account Branch', 'Receiver Account Branch')})
+        coords = np.array([get_coordinates(branch) for branch in nodes['branch']],
+                          dtype='float64').reshape(-1, 2)
+    else:
+        # Each person is placed at the home branch of their account, looked up
+        # in the account dimension
+        nodes, edges = aggregate_edges(filtered_df, node_attributes={
+            'account': ('Sender Account', 'Receiver Account')})
+        coords = accounts.reindex(nodes['account'])[['lat', 'lon']].to_numpy(dtype='float64')
+    nodes, edges, node_codes = prune_edges(nodes, edges, top_k, by, min_amount)
+    # A collapsed node sits at the mean position of the people it stands for
+    members = node_codes >= 0
+    counts = np.bincount(node_codes[members], minlength=len(nodes))
+    coords = np.column_stack([
+        np.bincount(node_codes[members], coords[members, i], len(nodes)) / counts
+        for i in range(2)])
+    pos = dict(zip(nodes['label'], coords))
+
+    sender_branches = edges['sender'].unique()
+    receiver_branches = edges['receiver'].unique()
     edge_trace = []
 
     sender_trace = go.Scattermapbox(
@@ -101,13 +175,27 @@ def transaction_map(filtered_df):
         textposition="top center"
     )
 
-    for u, v, data in G.edges(data=True):
-        lat = [pos[u][0], pos[v][0]]
-        lon = [pos[u][1], pos[v][1]]
-        weight = data['weight']
-        edge_trace.extend(add_arrow_trace(lat, lon, weight, u, v))
+    if batched and len(edges):
+        # All edges in one line trace per width bucket plus one arrowhead trace
+        source = edges['source'].to_numpy()
+        target = edges['target'].to_numpy()
+        lat = np.column_stack([coords[source, 0], coords[target, 0]])
+        lon = np.column_stack([coords[source, 1], coords[target, 1]])
+        edge_trace = batched_arrow_traces(
+            lat, lon, edges['amount'], edges['sender'], edges['receiver'])
+    else:
+        for u, v, weight in zip(edges['sender'], edges['receiver'], edges['amount']):
+            lat = [pos[u][0], pos[v][0]]
+            lon = [pos[u][1], pos[v][1]]
+            edge_trace.extend(add_arrow_trace(lat, lon, weight, u, v))
 
     fig = go.Figure(data=edge_trace + [sender_trace, receiver_trace])
+    return _map_layout(fig)
+
+# Function to set the map style and view shared by the maps
+
+
+def _map_layout(fig):
     fig.update_layout(
         mapbox=dict(
             # Replace with your actual Mapbox access token
@@ -119,5 +207,69 @@ def transaction_map(filtered_df):
         margin=dict(l=0, r=0, t=0, b=0),
         showlegend=False
     )
+    return fig
+
+
+# Function to draw the flows between branches, or between the grid cells of
+# branches at the coarser clustering levels. The figure has one marker per
+# cluster and one edge per pair of clusters, however many transactions the
+# flows stand for. Without a branch dimension it is built from the rows; the
+# "All transactions" scope draws dataset_flows, the flows of the whole
+# dataset, instead of those of the rows.
+
+
+@chart_cache.memoize
+def generate_branch_map(filtered_df, branches=None, dataset_flows=None, level=DEFAULT_LEVEL,
+                        scope=MAP_SCOPES[0], top_k=None, by='amount', min_amount=None):
+    if branches is None:
+        branches = build_branches(filtered_df)
+    if scope == MAP_SCOPES[1] and dataset_flows is not None:
+        flows = dataset_flows
+    else:
+        flows = branch_flows(filtered_df, branches)
+    clusters, edges = cluster_graph(flows, branches, level)
+    nodes, edges, node_codes = prune_edges(clusters, edges, top_k, by, min_amount)
+
+    # A collapsed node sits at the mean position of the branches it stands for
+    members = node_codes >= 0
+    codes = node_codes[members]
+    n_branches = np.bincount(codes, clusters['branches'].to_numpy()[members], len(nodes))
+    people = np.bincount(codes, clusters['people'].to_numpy()[members], len(nodes))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        coords = np.column_stack([
+            np.bincount(codes, (clusters[axis] * clusters['branches']).to_numpy()[members],
+                        len(nodes)) / n_branches
+            for axis in ('lat', 'lon')])
+
+    source = edges['source'].to_numpy()
+    target = edges['target'].to_numpy()
+    amount = edges['amount'].to_numpy(dtype='float64')
+    sent = np.bincount(source, amount, len(nodes))
+    received = np.bincount(target, amount, len(nodes))
+    total = sent + received
+    size = MIN_MARKER_SIZE + (MAX_MARKER_SIZE - MIN_MARKER_SIZE) * np.sqrt(
+        total / total.max() if len(total) and total.max() > 0 else total)
+
+    # Flows within a cluster are counted on its marker but not drawn
+    lines = source != target
+    edge_trace = []
+    if lines.any():
+        lat = np.column_stack([coords[source[lines], 0], coords[target[lines], 0]])
+        lon = np.column_stack([coords[source[lines], 1], coords[target[lines], 1]])
+        edge_trace = batched_arrow_traces(
+            lat, lon, amount[lines], edges['sender'][lines], edges['receiver'][lines])
+
+    cluster_trace = go.Scattermapbox(
+        lat=coords[:, 0],
+        lon=coords[:, 1],
+        mode='markers',
+        marker=dict(size=size, color=np.where(sent >= received, SENDER_COLOR, RECEIVER_COLOR)),
+        text=[f'{label}<br>Branches: {count:.0f}, people: {persons:.0f}'
+              f'<br>Sent: ${out:,.2f}<br>Received: ${into:,.2f}'
+              for label, count, persons, out, into in zip(
+                  nodes['label'], n_branches, people, sent, received)],
+        hoverinfo='text'
+    )
 
-    st.plotly_chart(fig, use_container_width=True)
+    fig = go.Figure(data=edge_trace + [cluster_trace])
+    return _map_layout(fig)
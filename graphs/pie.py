@@ -1,8 +1,13 @@
-import streamlit as st
 import plotly.express as px
 
+from utils.cache import chart_cache
 
-@st.cache_resource
-def generate_pie_chart(df, column, title):
+
+@chart_cache.memoize
+def generate_pie_chart(df, column, title, counts=None):
+    # Counts per value aggregated already, e.g. by the database, are drawn
+    # as given instead of one slice entry per row
+    if counts is not None:
+        return px.pie(names=counts.index, values=counts.to_numpy(), title=title)
     fig = px.pie(df, names=column, title=title)
     return fig
@@ -1,22 +1,26 @@
-import streamlit as st
 import plotly.graph_objects as go
 import pandas as pd
+import numpy as np
 
+from transformations.edges import aggregate_edges, prune_edges
+from transformations.scoring import flag_edges
+from utils.cache import chart_cache
 
-@st.cache_resource
-def generate_sankey(df):
-    # Combine sender and receiver names
-    all_nodes = list(df['Sender Name'].unique()) + \
-        list(df['Receiver Name'].unique())
-    node_labels = list(set(all_nodes))
+LINK_COLOR = 'rgba(160, 160, 160, 0.4)'
+FLAGGED_COLOR = 'rgba(214, 39, 40, 0.7)'
 
-    # Define the links
-    links = []
-    for _, row in df.iterrows():
-        source = node_labels.index(row['Sender Name'])
-        target = node_labels.index(row['Receiver Name'])
-        value = row['Amount']
-        links.append({'source': source, 'target': target, 'value': value})
+
+@chart_cache.memoize
+def generate_sankey(df, top_k=None, by='amount', min_amount=None, flagged=None,
+                    nodes=None, edges=None):
+    # One node per sender/receiver name and one link per (sender, receiver)
+    # pair, unless they were aggregated already
+    if edges is None:
+        nodes, edges = aggregate_edges(df)
+    nodes, edges, _ = prune_edges(nodes, edges, top_k, by, min_amount)
+    # Links with a flagged transaction are drawn in red
+    link_colors = np.where(flag_edges(edges, flagged), FLAGGED_COLOR, LINK_COLOR)
+    node_labels = list(nodes['label'])
 
     # Create the Sankey diagram
     fig = go.Figure(data=[go.Sankey(
@@ -27,9 +31,13 @@ def generate_sankey(df):
             label=node_labels,
         ),
         link=dict(
-            source=[link['source'] for link in links],
-            target=[link['target'] for link in links],
-            value=[link['value'] for link in links],
+            source=edges['source'].tolist(),
+            target=edges['target'].tolist(),
+            value=edges['amount'].tolist(),
+            customdata=edges['count'].tolist(),
+            color=link_colors.tolist(),
+            hovertemplate='%{source.label} → %{target.label}<br>'
+            'Amount: %{value}<br>Transactions: %{customdata}<extra></extra>',
         ))])
 
     fig.update_layout(title_text="Cash Flow Diagram", font_size=12)
@@ -1,119 +1,220 @@
-import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 
+from utils.cache import chart_cache
+
+# Candle resolutions offered for long date ranges
+RESOLUTIONS = {'Daily': 'D', 'Weekly': 'W', 'Monthly': 'MS'}
+ACCOUNTS_PER_PAGE = 8
+CHARTS_PER_ROW = 4
+
+
+# Function to compute the candles of each account. With the account dimension
+# the names are looked up per account instead of being grouped on.
+
+
+def preprocess_candlestick_data(df, freq='D', accounts=None):
+    # Work on the needed columns only so the caller's frame is left untouched
+    df = df[[
+        'Date and Time', 'Sender Account', 'Sender Name', 'Receiver Account',
+        'Receiver Name', 'Transaction Type', 'Amount',
+        'Sender Current Account Balance', 'Receiver Current Account Balance'
+    ]].copy()
 
-@st.cache_resource
-def preprocess_candlestick_data(df):
     # Calculate low and close values for sender transactions
     df['low_sender'] = df['Sender Current Account Balance'] - df['Amount']
     df['close_sender'] = df['Sender Current Account Balance'] - df['Amount']
     grouped_sender = df.groupby([
-        pd.Grouper(key='Date and Time', freq='D'),
+        pd.Grouper(key='Date and Time', freq=freq),
         'Sender Account',
-        'Sender Name',
+        *(['Sender Name'] if accounts is None else []),
         'Transaction Type'
-    ]).agg(
+    ], observed=True).agg(
         open=('Sender Current Account Balance', 'first'),
         high=('Sender Current Account Balance', 'max'),
         low=('low_sender', 'min'),
-        close=('close_sender', 'last')
+        close=('close_sender', 'last'),
+        amount=('Amount', 'sum'),
+        count=('Amount', 'size')
     ).reset_index()
     grouped_sender.rename(
         columns={'Sender Account': 'Account', 'Sender Name': 'Name'}, inplace=True)
+    grouped_sender['Side'] = 'sent'
 
     # Calculate low and close values for receiver transactions
     df['high_receiver'] = df['Receiver Current Account Balance'] + df['Amount']
     df['close_receiver'] = df['Receiver Current Account Balance'] + df['Amount']
     grouped_receiver = df.groupby([
-        pd.Grouper(key='Date and Time', freq='D'),
+        pd.Grouper(key='Date and Time', freq=freq),
         'Receiver Account',
-        'Receiver Name',
+        *(['Receiver Name'] if accounts is None else []),
         'Transaction Type'
-    ]).agg(
+    ], observed=True).agg(
         open=('Receiver Current Account Balance', 'first'),
         high=('high_receiver', 'max'),
         low=('Receiver Current Account Balance', 'min'),
-        close=('close_receiver', 'last')
+        close=('close_receiver', 'last'),
+        amount=('Amount', 'sum'),
+        count=('Amount', 'size')
     ).reset_index()
     grouped_receiver.rename(
         columns={'Receiver Account': 'Account', 'Receiver Name': 'Name'}, inplace=True)
+    grouped_receiver['Side'] = 'received'
 
     concatenated_df = pd.concat([grouped_sender, grouped_receiver])
+    if accounts is not None:
+        concatenated_df['Name'] = accounts['name'].reindex(
+            concatenated_df['Account'].astype(object)).to_numpy()
 
     # st.write(concatenated_df)
 
     return concatenated_df
 
 
-def display_transactions(filtered_df):
-    st.subheader('Transaction Timelines')
-
-    # Convert 'Date and Time' to datetime
-    filtered_df['Date and Time'] = pd.to_datetime(filtered_df['Date and Time'])
-
-    # Preprocess data for candlestick chart
-    candlestick_data = preprocess_candlestick_data(filtered_df)
-
-    # Get unique accounts
-    unique_accounts = filtered_df['Sender Account'].unique()
-
-    # Initialize column index
-    col_index = 0
-    cols = None
-
-    # Loop through each account and create a candlestick chart
-    for account in unique_accounts:
-        if col_index % 4 == 0:
-            # Create a new row with 4 columns
-            cols = st.columns(4)
-
-        # Filter data for the current account
-        account_data = candlestick_data[candlestick_data['Account'] == account]
-
-        # Create Plotly figure
-        fig = go.Figure()
-
-        # Add candlestick for sent transactions
-        sent_data = account_data[account_data['Transaction Type'] == 'Credit']
-        fig.add_trace(go.Candlestick(
-            x=sent_data['Date and Time'],
-            open=sent_data['open'],
-            high=sent_data['high'],
-            low=sent_data['low'],
-            close=sent_data['close'],
-            name='Sent Transactions',
-            increasing_line_color='red',
-            decreasing_line_color='red'
-        ))
-
-        # Add candlestick for received transactions
-        received_data = account_data[account_data['Transaction Type'] == 'Debit']
-        fig.add_trace(go.Candlestick(
-            x=received_data['Date and Time'],
-            open=received_data['open'],
-            high=received_data['high'],
-            low=received_data['low'],
-            close=received_data['close'],
-            name='Received Transactions',
-            increasing_line_color='green',
-            decreasing_line_color='green'
-        ))
-
-        name = candlestick_data[candlestick_data["Account"]
-                                == account]["Name"].iloc[0]
-
-        # Update layout
-        fig.update_layout(
-            title=f'Transaction Timelines for {name}',
-            xaxis_title='Date',
-            yaxis_title='Transaction Amount',
-            xaxis_rangeslider_visible=False,
-            template='plotly_dark'
-        )
-
-        # Display chart in the current column
-        cols[col_index % 4].plotly_chart(fig, use_container_width=True)
-
-        # Increment column index
-        col_index += 1
+# Function to split the candlestick data by account with a single groupby
+
+
+@chart_cache.memoize
+def candlestick_data_by_account(df, freq='D', accounts=None):
+    candlestick_data = preprocess_candlestick_data(df, freq=freq, accounts=accounts)
+    return dict(tuple(candlestick_data.groupby('Account', sort=False, observed=True)))
+
+# Function to precompute the daily candles, amounts and counts of every
+# account on each side, sorted by day. Built once per loaded source and
+# extended as rows are appended.
+
+
+def daily_rollups(df, accounts=None):
+    rollups = preprocess_candlestick_data(df, freq='D', accounts=accounts)
+    return rollups.sort_values('Date and Time', kind='stable').reset_index(drop=True)
+
+# Function to fold the rows appended at offset into the daily rollups. Only
+# the (day, account) candles the new rows fall in are regrouped; the loaded
+# rows come first, so they keep the open and the new rows set the close.
+
+
+def extend_rollups(rollups, df, offset, accounts=None):
+    batch = preprocess_candlestick_data(df.iloc[offset:], freq='D', accounts=accounts)
+    keys = ['Date and Time', 'Account', 'Side', 'Transaction Type']
+    if accounts is None:
+        keys.append('Name')
+    touched = (rollups['Date and Time'].isin(batch['Date and Time'].unique()) &
+               rollups['Account'].isin(batch['Account'].unique()))
+    merged = pd.concat([rollups[touched], batch], ignore_index=True).groupby(
+        keys, observed=True, sort=False, dropna=False).agg(
+        open=('open', 'first'),
+        high=('high', 'max'),
+        low=('low', 'min'),
+        close=('close', 'last'),
+        amount=('amount', 'sum'),
+        count=('count', 'sum')
+    ).reset_index()
+    rollups = pd.concat([rollups[~touched], merged], ignore_index=True)
+    if accounts is not None:
+        # Appended rows may also change the names in the account dimension
+        rollups['Name'] = accounts['name'].reindex(rollups['Account'].astype(object)).to_numpy()
+    rollups = rollups[list(batch.columns)]
+    return rollups.sort_values('Date and Time', kind='stable').reset_index(drop=True)
+
+# Function to build the candles of the given accounts in the window [start,
+# end] from the daily rollups. The window is found with a binary search on the
+# days; coarser resolutions regroup the daily candles.
+
+
+def rollup_candles(rollups, accounts, start=None, end=None, freq='D'):
+    days = rollups['Date and Time'].to_numpy()
+    lo = 0 if start is None else days.searchsorted(
+        np.datetime64(pd.Timestamp(start).normalize()))
+    hi = len(days) if end is None else days.searchsorted(
+        np.datetime64(pd.Timestamp(end).normalize()), 'right')
+    candles = rollups.iloc[lo:hi]
+    candles = candles[candles['Account'].isin(accounts)]
+    if freq == 'D':
+        return candles
+    return candles.groupby([
+        pd.Grouper(key='Date and Time', freq=freq),
+        'Account',
+        'Name',
+        'Side',
+        'Transaction Type'
+    ], observed=True, sort=False, dropna=False).agg(
+        open=('open', 'first'),
+        high=('high', 'max'),
+        low=('low', 'min'),
+        close=('close', 'last'),
+        amount=('amount', 'sum'),
+        count=('count', 'sum')
+    ).reset_index()
+
+
+# Function to build the candles of the given accounts as the selected rows df
+# show them. The daily rollups hold the full history, so they are only used
+# for accounts whose rows in the window are all in the selection; the others,
+# like counterparties of the selected accounts, are built from the rows.
+
+
+def selection_candles_by_account(rollups, df, accounts, start=None, end=None, freq='D',
+                                 dimension=None, cache_key=None):
+    candles = rollup_candles(rollups, accounts, start, end, freq)
+    covered = candles.groupby('Account', observed=True)['count'].sum()
+    covered.index = covered.index.astype(object)
+    selected = pd.concat([df['Sender Account'].astype(object),
+                          df['Receiver Account'].astype(object)]).value_counts()
+    partial = covered.index[covered.to_numpy() != selected.reindex(
+        covered.index, fill_value=0).to_numpy()]
+
+    complete = candles[~candles['Account'].astype(object).isin(partial)]
+    candlestick_data = dict(tuple(complete.groupby('Account', sort=False, observed=True)))
+    if len(partial):
+        rows = df[df['Sender Account'].astype(object).isin(partial) |
+                  df['Receiver Account'].astype(object).isin(partial)]
+        built = candlestick_data_by_account(
+            rows, freq=freq, accounts=dimension,
+            cache_key=cache_key and f'{cache_key}:partial')
+        candlestick_data.update((account, built[account]) for account in partial)
+    return candlestick_data
+
+
+def account_candlestick(account_data):
+    # Create Plotly figure
+    fig = go.Figure()
+
+    # Add candlestick for sent transactions
+    sent_data = account_data[account_data['Transaction Type'] == 'Credit']
+    fig.add_trace(go.Candlestick(
+        x=sent_data['Date and Time'],
+        open=sent_data['open'],
+        high=sent_data['high'],
+        low=sent_data['low'],
+        close=sent_data['close'],
+        name='Sent Transactions',
+        increasing_line_color='red',
+        decreasing_line_color='red'
+    ))
+
+    # Add candlestick for received transactions
+    received_data = account_data[account_data['Transaction Type'] == 'Debit']
+    fig.add_trace(go.Candlestick(
+        x=received_data['Date and Time'],
+        open=received_data['open'],
+        high=received_data['high'],
+        low=received_data['low'],
+        close=received_data['close'],
+        name='Received Transactions',
+        increasing_line_color='green',
+        decreasing_line_color='green'
+    ))
+
+    name = account_data['Name'].iloc[0]
+
+    # Update layout
+    fig.update_layout(
+        title=f'Transaction Timelines for {name}',
+        xaxis_title='Date',
+        yaxis_title='Transaction Amount',
+        xaxis_rangeslider_visible=False,
+        template='plotly_dark'
+    )
+    return fig
+
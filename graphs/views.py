@@ -0,0 +1,148 @@
+import math
+
+import streamlit as st
+
+from graphs.map import generate_branch_map, generate_map
+from graphs.timeline import (ACCOUNTS_PER_PAGE, CHARTS_PER_ROW, RESOLUTIONS,
+                             account_candlestick, candlestick_data_by_account,
+                             selection_candles_by_account)
+from transformations.geo import CLUSTER_LEVELS, MAP_SCOPES, branch_rows, involved_branches
+from transformations.summary import (TRANSACTION_COLUMNS, account_summary, format_summary,
+                                      involved_accounts, label_transactions)
+from transformations.table import PAGE_SIZES, page_rows, search_rows, sort_rows
+
+# Streamlit rendering of the dashboard panels. Everything these build on is
+# Streamlit-free and shared with the batch reports.
+
+
+# Function to show the map of the selection. Flows are drawn between branches
+# or clusters of branches, fig may be that branch map already built with the
+# same controls. People are only drawn for the branch drilled down to.
+# dataset_flows are the flows of the whole dataset, when they are loaded.
+
+
+def transaction_map(filtered_df, cache_key=None, fig=None, branches=None, dataset_flows=None,
+                    accounts=None, pruning=None):
+    st.subheader('Interactive Map of Transactions')
+    pruning = pruning or {}
+    col_level, col_scope, col_branch = st.columns(3)
+    level = col_level.radio('Clustering', list(CLUSTER_LEVELS), horizontal=True,
+                            key='map_level')
+    scope = MAP_SCOPES[0]
+    if dataset_flows is not None:
+        scope = col_scope.radio('Flows', MAP_SCOPES, horizontal=True, key='map_scope')
+    branch = col_branch.selectbox('Drill down to branch',
+                                  [None] + list(involved_branches(filtered_df)),
+                                  format_func=lambda branch: branch or 'All branches',
+                                  key='map_branch')
+
+    if branch is not None:
+        fig = generate_map(branch_rows(filtered_df, branch), accounts=accounts,
+                           cache_key=cache_key and f'{cache_key}:{branch}', **pruning)
+    elif fig is None:
+        fig = generate_branch_map(filtered_df, branches=branches, dataset_flows=dataset_flows,
+                                  level=level, scope=scope, cache_key=cache_key, **pruning)
+    st.plotly_chart(fig, use_container_width=True)
+    return fig
+
+
+# Function to show the candles of the accounts in the selection, taken from
+# the daily rollups of the window when they are given for the accounts whose
+# rows are all selected
+
+
+def display_transactions(filtered_df, cache_key=None, accounts=None, rollups=None, window=None):
+    st.subheader('Transaction Timelines')
+
+    # Get unique accounts
+    unique_accounts = filtered_df['Sender Account'].unique()
+    pages = max(1, math.ceil(len(unique_accounts) / ACCOUNTS_PER_PAGE))
+
+    col_resolution, col_page = st.columns(2)
+    resolution = col_resolution.radio(
+        'Resolution', list(RESOLUTIONS), horizontal=True, key='timeline_resolution')
+    page = col_page.number_input(
+        f'Page (of {pages})', min_value=1, max_value=pages, value=1) if pages > 1 else 1
+
+    # Preprocess data for candlestick chart, split by account
+    if rollups is not None:
+        start, end = window or (None, None)
+        candlestick_data = selection_candles_by_account(
+            rollups, filtered_df, unique_accounts, start, end, freq=RESOLUTIONS[resolution],
+            dimension=accounts, cache_key=cache_key)
+    else:
+        candlestick_data = candlestick_data_by_account(
+            filtered_df, freq=RESOLUTIONS[resolution], accounts=accounts, cache_key=cache_key)
+
+    # Only the figures on the visible page are built
+    start = (page - 1) * ACCOUNTS_PER_PAGE
+    visible_accounts = unique_accounts[start:start + ACCOUNTS_PER_PAGE]
+
+    figures = []
+    for col_index, account in enumerate(visible_accounts):
+        if col_index % CHARTS_PER_ROW == 0:
+            # Create a new row of charts
+            cols = st.columns(CHARTS_PER_ROW)
+
+        fig = account_candlestick(candlestick_data[account])
+
+        # Display chart in the current column
+        cols[col_index % CHARTS_PER_ROW].plotly_chart(
+            fig, use_container_width=True)
+        figures.append(fig)
+    return figures
+
+# Function to render the search, sort and page controls of a table and return
+# the rows of the current page, searched and sorted over the whole frame
+
+
+def paged_table(df, key, sort_columns=None):
+    search, sort, direction, size, page = st.columns((3, 2, 1, 1, 1))
+    query = search.text_input('Search', key=f'{key}_search')
+    sort_column = sort.selectbox('Sort by', [None] + list(sort_columns or df.columns),
+                                 format_func=lambda column: column or 'Original order',
+                                 key=f'{key}_sort')
+    descending = direction.toggle('Descending', key=f'{key}_descending')
+    page_size = size.selectbox('Rows', PAGE_SIZES, key=f'{key}_page_size')
+
+    df = sort_rows(search_rows(df, query), sort_column, ascending=not descending)
+    # Out of range pages are clamped, the number of pages changes with the search
+    page_number = page.number_input('Page', min_value=1, value=1, key=f'{key}_page')
+    rows, page_number, pages = page_rows(df, page_number, page_size)
+    start = (page_number - 1) * page_size
+    st.caption(f'Rows {start + 1 if len(rows) else 0}-{start + len(rows)} of {len(df)}')
+    return rows
+
+# Function to generate the summary of transactions, summary_df may be an
+# account_summary that was already computed. Only the visible page is
+# formatted.
+
+
+def summary_of_transactions(df, filtered_df, summary_df=None):
+    if summary_df is None:
+        summary_df = account_summary(df, involved_accounts(filtered_df))
+
+    st.subheader('Summary of Transactions')
+    summary_df = format_summary(paged_table(summary_df, 'summary_table'))
+    st.dataframe(summary_df, hide_index=True)
+    return summary_df
+
+# Function to list the flagged transactions of the selection, highest score
+# first
+
+
+def flagged(flagged_df):
+    st.subheader('Flagged Transactions')
+    st.caption('Ranked by score: bursts of transfers from the sender, amounts unusual '
+               'for the sender and transfers sent back within a week')
+    df = paged_table(flagged_df, 'flagged_table')
+    st.dataframe(df, hide_index=True)
+    return df
+
+
+def transactions(df):
+    st.subheader('Detailed Transactions List')
+    # Icons are added to the visible page only
+    df = label_transactions(paged_table(df[TRANSACTION_COLUMNS], 'transactions_table'))
+    st.dataframe(df, hide_index=True)
+    return df
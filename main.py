@@ -1,24 +1,164 @@
+import os
+import time
+
+# Start of the script run, the time to first render is measured from here
+started = time.perf_counter()
+
 import streamlit as st
 import pandas as pd
-import numpy as np
-import altair as alt
-import streamlit.components.v1 as components
+
+# Selections, column subsets and slices of the shared frame stay views until
+# they are written to, so sessions never copy the loaded data
+pd.set_option('mode.copy_on_write', True)
+
+from transformations.summary import account_summary, involved_accounts, totals_summary
+from transformations.report import select
+from transformations.ingest import ensure_store, empty_frame, memory_report, read_delta, source_version
+from transformations.index import filter_options
+from transformations.adjacency import DIRECTIONS, build_adjacency, extend_adjacency
+from transformations.geo import DEFAULT_LEVEL, MAP_SCOPES, branch_tables, extend_branch_tables
+from transformations.timeindex import build_time_index, extend_time_index, time_range
+from transformations.scoring import extend_scores, flagged_transactions, score_transactions
+from transformations.incremental import IncrementalDataset
+from transformations.stream import stream_account_rows, stream_filter_options, stream_selection
+from transformations.sql import SqlBackend
+from utils.cache import chart_cache, selection_fingerprint
+from utils.profiling import Profiler, profiling_enabled
+from utils.parallel import PanelBuilder, deferred_enabled, parallel_enabled
+
+# Transaction export the dashboard is served from
+PATH = os.environ.get('DASHBOARD_SOURCE', 'data/Data.xlsx')
+# Sources larger than this are filtered chunk by chunk instead of being loaded
+# into memory as a whole
+STREAMING_THRESHOLD_BYTES = int(
+    os.environ.get('STREAMING_THRESHOLD_BYTES', 1024 ** 3))
+# DASHBOARD_BACKEND=sqlite runs filters and aggregates as SQL on an embedded
+# database instead of the in-memory frame
+BACKEND = os.environ.get('DASHBOARD_BACKEND', 'pandas').lower()
+# Most nodes the sankey, map and ego graph show; the rest is collapsed into
+# an "Other" node
+GRAPH_NODE_LIMIT = int(os.environ.get('GRAPH_NODE_LIMIT', 100))
+# Directory on a shared memory filesystem, e.g. /dev/shm, where the loaded
+# frame is written once and mapped by every Streamlit process on the host.
+# Batches appended in one process reach the others on their next rerun, and
+# the frame with them is mapped from the same directory.
+SHARED_MEMORY_DIR = os.environ.get('SHARED_MEMORY_DIR')
+
+# Columns read from the columnar store for the dashboard views
+DASHBOARD_COLUMNS = [
+    'ID', 'Sender Account', 'Sender Account Branch', 'Sender Account Type',
+    'Sender Name', 'Sender Current Account Balance', 'Receiver Account',
+    'Receiver Account Branch', 'Receiver Account Type',
+    'Receiver Current Account Balance', 'Receiver Name', 'Amount',
+    'Date and Time', 'Sender Phone Number', 'Receiver Phone Number',
+    'Purpose of Transaction', 'Transaction Type'
+]
+# Pie charts by panel name: the column they count and their title
+PIES = {
+    'transaction_purpose_pie': ('Purpose of Transaction', 'Transaction Purposes Distribution'),
+    'transaction_type_pie': ('Transaction Type', 'Transaction Types Distribution'),
+    'sender_name_pie': ('Sender Name', 'Sender Names Distribution'),
+    'receiver_name_pie': ('Receiver Name', 'Receiver Names Distribution'),
+}
+# Panels that are only built once opened in deferred mode
+DEFERRED_PANELS = {
+    'map': 'Map', 'ego': 'Ego Graph', 'timelines': 'Timelines', 'summary': 'Summary'}
+
+
+# The frame, its filter index and running totals, shared read-only by all
+# sessions of the process. The source version is part of the cache key so
+# edits to the workbook rebuild it; appended batches are folded in without a
+# rebuild. Only the current version is kept, so an edit releases the old one.
+@st.cache_resource(max_entries=1)
+def load_dataset(PATH, version):
+    return IncrementalDataset(PATH, DASHBOARD_COLUMNS, shared_dir=SHARED_MEMORY_DIR)
+
+
+# Adjacency index for multi-hop expansion, extended with appended rows
+def load_adjacency(dataset, snapshot):
+    return dataset.derived('adjacency', snapshot, build_adjacency, extend_adjacency)
+
+
+# Time layout and daily per-account rollups for the date range filter and the
+# timelines. They are kept by the shared dataset and extended with appended
+# rows instead of being rebuilt for every version.
+def load_time_index(dataset, snapshot):
+    return dataset.derived('time_index', snapshot, build_time_index, extend_time_index)
+
+
+def load_rollups(dataset, snapshot):
+    from graphs.timeline import daily_rollups, extend_rollups
+
+    accounts = snapshot['accounts']
+    return dataset.derived(
+        'rollups', snapshot, lambda frame: daily_rollups(frame, accounts),
+        lambda rollups, frame, offset: extend_rollups(rollups, frame, offset, accounts))
+
+
+# Branch dimension and the flows between branches over the whole dataset for
+# the map, extended with appended rows
+def load_branches(dataset, snapshot):
+    accounts = snapshot['accounts']
+    return dataset.derived(
+        'branches', snapshot, lambda frame: branch_tables(frame, accounts),
+        lambda tables, frame, offset: extend_branch_tables(tables, frame, offset, accounts))
+
+
+# Anomaly scores of every transaction against the full history, extended with
+# appended rows
+def load_scores(dataset, snapshot):
+    return dataset.derived('scores', snapshot, score_transactions, extend_scores)
+
+
+@st.cache_data
+def load_memory_report(PATH, version, _dataset):
+    return memory_report(_dataset.frame)
+
+
+# Streaming mode reads the memory-mapped store in chunks, so only the options
+# and the matching rows are held in memory. Results are cached as resources so
+# sessions share them instead of each unpickling its own copy.
+@st.cache_resource(max_entries=1)
+def load_stream_options(PATH, version):
+    store_path, _ = ensure_store(PATH)
+    return stream_filter_options(store_path)
 
 
-from graphs.timeline import display_transactions
-from graphs.sankey import generate_sankey
-from graphs.pie import generate_pie_chart
-from graphs.ego import ego
-from graphs.map import transaction_map
+@st.cache_resource(max_entries=32)
+def load_stream_selection(PATH, version, selections):
+    store_path, _ = ensure_store(PATH)
+    return stream_selection(store_path, selections, DASHBOARD_COLUMNS)
 
-from transformations.summary import summary_of_transactions, transactions
 
-PATH = 'data/Data.xlsx'
+@st.cache_resource(max_entries=32)
+def load_stream_account_rows(PATH, version, accounts):
+    store_path, _ = ensure_store(PATH)
+    return stream_account_rows(store_path, accounts, DASHBOARD_COLUMNS)
+
+
+@st.cache_resource(max_entries=1)
+def load_sql_backend(PATH, version):
+    return SqlBackend(PATH)
 
 
 @st.cache_data
-def load_dataset(PATH):
-    return pd.read_excel(PATH)
+def load_sql_options(PATH, version, field):
+    return load_sql_backend(PATH, version).options(field)
+
+
+# Rows of a selection with its metrics, pie counts and graph edges, queried
+# once per selection and shared by sessions like the streaming selections. The
+# counts and edges are grouped by the database instead of from the rows.
+@st.cache_resource(max_entries=32)
+def load_sql_selection(PATH, version, selections):
+    backend = load_sql_backend(PATH, version)
+    return {
+        'rows': backend.filter(selections, DASHBOARD_COLUMNS),
+        'metrics': backend.metrics(selections),
+        'counts': {column: backend.value_counts(selections, column)
+                   for column, _ in PIES.values()},
+        'edges': backend.edges(selections),
+    }
 
 
 metric_style = """
@@ -48,48 +188,129 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="expanded")
 
-alt.themes.enable("dark")
 # Display metrics with styling
 st.markdown(metric_style, unsafe_allow_html=True)
-# Load the data
-df = load_dataset(PATH)
+profiler = Profiler(enabled=profiling_enabled(st.query_params), started=started)
 
-combined_names = sorted(set(df['Sender Name']).union(set(df['Receiver Name'])))
-combined_phone_numbers = sorted(
-    set(df['Sender Phone Number']).union(set(df['Receiver Phone Number'])))
-combined_acc_no = sorted(
-    set(df['Sender Account']).union(set(df['Receiver Account'])))
+# Load the data
+version = source_version(PATH)
+# Account dimension for attribute lookups, only held by the in-memory backend
+accounts = None
+time_index = None
+rollups = None
+# Branch dimension and dataset flows of the map, only held in memory
+branches = None
+dataset_flows = None
+streaming = os.path.getsize(PATH) > STREAMING_THRESHOLD_BYTES
+use_sql = BACKEND == 'sqlite'
+
+if use_sql:
+    backend = load_sql_backend(PATH, version)
+    combined_names = load_sql_options(PATH, version, 'name')
+    combined_phone_numbers = load_sql_options(PATH, version, 'phone')
+    combined_acc_no = load_sql_options(PATH, version, 'account')
+elif streaming:
+    stream_options = load_stream_options(PATH, version)
+    combined_names = stream_options['name']
+    combined_phone_numbers = stream_options['phone']
+    combined_acc_no = stream_options['account']
+else:
+    dataset = load_dataset(PATH, version)
+    # Batches appended by other processes serving the source since the last run
+    dataset.refresh()
+    # One consistent view of the data for this run, even if a batch is
+    # appended meanwhile
+    snapshot = dataset.snapshot()
+    df = snapshot['frame']
+    filter_index = snapshot['index']
+    accounts = snapshot['accounts']
+    version = snapshot['version']
+    time_index = load_time_index(dataset, snapshot)
+
+    combined_names = filter_options(filter_index, 'name')
+    combined_phone_numbers = filter_options(filter_index, 'phone')
+    combined_acc_no = filter_options(filter_index, 'account')
 
 with st.sidebar:
     st.title('Bank Transactions Dashboard')
+    if not (streaming or use_sql):
+        report = load_memory_report(PATH, version, dataset)
+        st.caption(
+            f"{report['rows']:,} transactions in {report['bytes'] / 1024 ** 2:.1f} MB "
+            f"({report['saved_bytes'] / 1024 ** 2:.1f} MB saved by compact dtypes)")
+        with st.expander('Append transactions'):
+            delta_file = st.file_uploader(
+                'New transactions', type=['csv', 'xlsx', 'parquet'])
+            if delta_file is not None and st.button('Append'):
+                try:
+                    st.session_state['appended'] = dataset.append(
+                        read_delta(delta_file, delta_file.name))
+                except ValueError as error:
+                    st.error(str(error))
+                else:
+                    # Rerun so this page uses the extended snapshot
+                    st.rerun()
+            if 'appended' in st.session_state:
+                st.caption(
+                    f"Appended {st.session_state['appended']} new transactions")
     names = st.multiselect('Select a name', combined_names)
     phone_numbers = st.multiselect(
         'Select a phone number', combined_phone_numbers)
     acc_no = st.multiselect('Select an account number', combined_acc_no)
-
-filtered_df = df.copy()
-
-filtered_dfs = []
-
-if names:
-    filtered_df_1 = filtered_df[filtered_df['Sender Name'].isin(
-        names) | filtered_df['Receiver Name'].isin(names)]
-    filtered_dfs.append(filtered_df_1)
-
-if phone_numbers:
-    filtered_df_2 = filtered_df[filtered_df['Sender Phone Number'].isin(
-        phone_numbers) | filtered_df['Receiver Phone Number'].isin(phone_numbers)]
-    filtered_dfs.append(filtered_df_2)
-
-if acc_no:
-    filtered_df_3 = filtered_df[filtered_df['Sender Account'].isin(
-        acc_no) | filtered_df['Receiver Account'].isin(acc_no)]
-    filtered_dfs.append(filtered_df_3)
-
-# Concatenate all filtered dataframes, avoiding duplicate columns
-if filtered_dfs:
-    filtered_df = pd.concat(filtered_dfs, axis=0).loc[:, ~pd.concat(
-        filtered_dfs, axis=0).columns.duplicated()]
+    window = None
+    if time_index is not None and len(df):
+        first, last = time_range(time_index)
+        dates = st.date_input('Date range', value=(first.date(), last.date()),
+                              min_value=first.date(), max_value=last.date())
+        # A single date is returned while the range is being picked
+        if len(dates) == 2 and (dates[0] > first.date() or dates[1] < last.date()):
+            window = dates
+    with st.expander('Graph pruning'):
+        top_k = st.slider('Top counterparties', min_value=1, max_value=GRAPH_NODE_LIMIT,
+                          value=min(50, GRAPH_NODE_LIMIT))
+        rank_by = st.radio('Rank by', ['amount', 'count'], horizontal=True,
+                           format_func=str.title)
+        min_amount = st.number_input('Minimum edge amount', min_value=0.0, value=0.0,
+                                     step=100.0)
+    pruning = {'top_k': top_k, 'by': rank_by, 'min_amount': min_amount}
+    expansion = {}
+    if not (streaming or use_sql):
+        with st.expander('Multi-hop expansion'):
+            hops = st.slider('Hops', min_value=1, max_value=4, value=1,
+                             help='1 shows only the transactions of the selection')
+            direction = st.radio('Direction', DIRECTIONS, horizontal=True,
+                                 format_func={'both': 'Both', 'out': 'Money out',
+                                              'in': 'Money in'}.get)
+            time_ordered = st.checkbox('Time-ordered paths')
+        if hops > 1:
+            expansion = {'hops': hops, 'direction': direction,
+                         'time_ordered': time_ordered}
+
+selections = {
+    'name': names,
+    'phone': phone_numbers,
+    'account': acc_no,
+}
+with profiler.stage('filter', rows_in=None if streaming or use_sql else len(df)) as record:
+    if use_sql:
+        sql_selection = load_sql_selection(PATH, version, selections)
+        filtered_df = sql_selection['rows']
+        aggregates = sql_selection['metrics']
+    elif streaming:
+        aggregates = load_stream_selection(PATH, version, selections)
+        filtered_df = aggregates['rows']
+        if filtered_df is None:
+            filtered_df = empty_frame(DASHBOARD_COLUMNS)
+    else:
+        # Union of the matching row positions, so a transaction matched by several
+        # filters is only included once
+        adjacency = load_adjacency(dataset, snapshot) if expansion else None
+        filtered_df, aggregates = select(
+            df, filter_index, selections, adjacency, time_index, window, **expansion)
+    record['rows_out'] = len(filtered_df)
+# Chart builders are cached on this key instead of hashing filtered_df
+selection_key = selection_fingerprint(
+    version, selections, dict(expansion, window=[str(date) for date in window or ()]))
 
 
 if names or phone_numbers or acc_no:
@@ -99,7 +320,7 @@ if names or phone_numbers or acc_no:
             f"""
             <div class="metric-box">
                 <div class="metric-title">Total Transactions</div>
-                <div class="metric-value">{filtered_df.shape[0]}</div>
+                <div class="metric-value">{aggregates['transactions']}</div>
             </div>
             """,
             unsafe_allow_html=True
@@ -110,7 +331,7 @@ if names or phone_numbers or acc_no:
             f"""
             <div class="metric-box">
                 <div class="metric-title">Total Amount</div>
-                <div class="metric-value">{filtered_df['Amount'].sum()} USD</div>
+                <div class="metric-value">{aggregates['amount']} USD</div>
             </div>
             """,
             unsafe_allow_html=True
@@ -121,59 +342,158 @@ if names or phone_numbers or acc_no:
             f"""
             <div class="metric-box">
                 <div class="metric-title">No. of Involved</div>
-                <div class="metric-value">{len(np.unique(
-    np.concatenate([filtered_df['Sender Account'].unique(), filtered_df['Receiver Account'].unique()])
-        ))}</div>
+                <div class="metric-value">{aggregates['accounts']}</div>
             </div>
             """,
             unsafe_allow_html=True
         )
 
-    colp1, colp2, colp3, colp4 = st.columns((2, 2, 2, 2), gap='small')
-    with colp1:
-        transaction_purpose_pie = generate_pie_chart(
-            filtered_df, 'Purpose of Transaction', 'Transaction Purposes Distribution')
-        st.plotly_chart(transaction_purpose_pie, use_container_width=True)
-    with colp2:
-        transaction_type_pie = generate_pie_chart(
-            filtered_df, 'Transaction Type', 'Transaction Types Distribution')
-        st.plotly_chart(transaction_type_pie, use_container_width=True)
-    with colp3:
-        sender_name_pie = generate_pie_chart(
-            filtered_df, 'Sender Name', 'Sender Names Distribution')
-        st.plotly_chart(sender_name_pie, use_container_width=True)
-    with colp4:
-        receiver_name_pie = generate_pie_chart(
-            filtered_df, 'Receiver Name', 'Receiver Names Distribution')
-        st.plotly_chart(receiver_name_pie, use_container_width=True)
-
-    sankey_fig = generate_sankey(filtered_df)
-
-    st.plotly_chart(sankey_fig, use_container_width=True)
-
-    col1, col2 = st.columns((4, 4), gap='small')
-
-    with col1:
-        transaction_map(filtered_df)
-
-    with col2:
-        st.subheader('Ego Graph')
-        G = ego(filtered_df)
-
-        # Save the network to an HTML file
-        html_file_path = 'network_graph.html'
-        G.write_html(html_file_path)
-        with open(html_file_path, 'r', encoding='utf-8') as file:
-            html_content = file.read()
-
-        # Display the HTML content in Streamlit
-        components.html(html_content, height=450, width=700)
-
-    display_transactions(filtered_df)
-
-    summary_of_transactions(df, filtered_df)
-    transactions(filtered_df)
-
+    profiler.mark('first_render')
+
+    # The graph libraries are imported once something is selected, the
+    # landing page doesn't need them
+    import streamlit.components.v1 as components
+    from graphs.ego import ego_html
+    from graphs.map import generate_branch_map
+    from graphs.pie import generate_pie_chart
+    from graphs.sankey import generate_sankey
+    from graphs.timeline import RESOLUTIONS, candlestick_data_by_account
+    from graphs.views import (display_transactions, flagged, summary_of_transactions,
+                              transaction_map, transactions)
+
+    # In deferred mode only the panel opened in the picker below is built
+    deferred = deferred_enabled(st.query_params)
+    opened = {st.session_state.get('open_panel')} if deferred else set(DEFERRED_PANELS)
+
+    if use_sql:
+        # The summary is computed by the database, no source frame is needed
+        summary_source = None
+    elif streaming:
+        # Summaries only need the transactions touching the involved accounts
+        involved = sorted(involved_accounts(filtered_df))
+        summary_source = load_stream_account_rows(PATH, version, involved)
+    else:
+        summary_source = df
+        if 'timelines' in opened:
+            rollups = load_rollups(dataset, snapshot)
+        if 'map' in opened:
+            branches, dataset_flows = load_branches(dataset, snapshot)
+
+    with profiler.stage('scoring', rows_in=len(filtered_df)) as record:
+        if streaming or use_sql:
+            # Only the selected rows are loaded, so they are scored on their own
+            scores = score_transactions(filtered_df)
+        else:
+            scores = load_scores(dataset, snapshot)
+        flagged_df = flagged_transactions(filtered_df, scores)
+        record['rows_out'] = len(flagged_df)
+
+    # The panels don't depend on each other; in parallel mode they are all
+    # built on the worker pool here and rendered below in layout order
+    panels = PanelBuilder(parallel=parallel_enabled(st.query_params))
+    # The database backend hands the pies their counts and the graphs their
+    # edges, the other backends aggregate the selected rows
+    counts = sql_selection['counts'] if use_sql else {}
+    graph = {}
+    if use_sql:
+        graph['nodes'], graph['edges'] = sql_selection['edges']
+    for name, (column, title) in PIES.items():
+        panels.submit(name, generate_pie_chart, filtered_df, column, title,
+                      counts=counts.get(column), cache_key=selection_key)
+    panels.submit('sankey', generate_sankey, filtered_df, flagged=flagged_df,
+                  cache_key=selection_key, **pruning, **graph)
+    # The branch map is built with the map controls of the last run, unless
+    # a branch is drilled down to
+    build_branch_map = 'map' in opened and st.session_state.get('map_branch') is None
+    if build_branch_map:
+        panels.submit('map', generate_branch_map, filtered_df, branches=branches,
+                      dataset_flows=dataset_flows,
+                      level=st.session_state.get('map_level', DEFAULT_LEVEL),
+                      scope=st.session_state.get('map_scope', MAP_SCOPES[0]),
+                      cache_key=selection_key, **pruning)
+    if 'ego' in opened:
+        panels.submit('ego', ego_html, filtered_df, flagged=flagged_df,
+                      cache_key=selection_key, **pruning, **graph)
+    if 'summary' in opened:
+        if use_sql:
+            panels.submit('summary', backend.account_summary,
+                          involved_accounts(filtered_df))
+        elif streaming:
+            panels.submit('summary', account_summary,
+                          summary_source, involved_accounts(filtered_df))
+        else:
+            # Looked up in the account totals kept with the snapshot
+            panels.submit('summary', totals_summary,
+                          snapshot['totals'], involved_accounts(filtered_df), accounts)
+    if 'timelines' in opened and panels.parallel and rollups is None:
+        # Warms the chart cache for the resolution display_transactions will use
+        panels.submit('timelines', candlestick_data_by_account, filtered_df,
+                      freq=RESOLUTIONS[st.session_state.get(
+                          'timeline_resolution', 'Daily')], accounts=accounts,
+                      cache_key=selection_key)
+
+    for column, name in zip(st.columns((2, 2, 2, 2), gap='small'), PIES):
+        with column, profiler.stage(name, rows_in=len(filtered_df)) as record:
+            pie = panels.result(name)
+            st.plotly_chart(pie, use_container_width=True)
+            record['payload'] = pie
+
+    with profiler.stage('sankey', rows_in=len(filtered_df)) as record:
+        sankey_fig = panels.result('sankey')
+
+        st.plotly_chart(sankey_fig, use_container_width=True)
+        record['payload'] = sankey_fig
+
+    if deferred:
+        st.radio('Panel', list(DEFERRED_PANELS), index=None, horizontal=True,
+                 format_func=DEFERRED_PANELS.get, key='open_panel',
+                 help='Only the opened panel is built')
+        col1, col2 = st.container(), st.container()
+    else:
+        col1, col2 = st.columns((4, 4), gap='small')
+
+    if 'map' in opened:
+        with col1, profiler.stage('map', rows_in=len(filtered_df)) as record:
+            record['payload'] = transaction_map(
+                filtered_df, cache_key=selection_key,
+                fig=panels.result('map') if build_branch_map else None,
+                branches=branches, dataset_flows=dataset_flows, accounts=accounts,
+                pruning=pruning)
+
+    if 'ego' in opened:
+        with col2, profiler.stage('ego', rows_in=len(filtered_df)) as record:
+            st.subheader('Ego Graph')
+            # Rendered in memory, nothing is written to the working directory
+            html_content = panels.result('ego')
+
+            # Display the HTML content in Streamlit
+            components.html(html_content, height=450, width=700)
+            record['payload'] = html_content
+
+    if 'timelines' in opened:
+        with profiler.stage('timelines', rows_in=len(filtered_df)) as record:
+            if panels.parallel and rollups is None:
+                panels.result('timelines')
+            timeline_figs = display_transactions(
+                filtered_df, cache_key=selection_key, accounts=accounts,
+                rollups=rollups, window=window)
+            record['rows_out'] = len(timeline_figs)
+            record['payload'] = timeline_figs
+
+    if 'summary' in opened:
+        with profiler.stage('summary', rows_in=len(filtered_df)) as record:
+            summary_df = summary_of_transactions(
+                summary_source, filtered_df, summary_df=panels.result('summary'))
+            record['rows_out'] = len(summary_df)
+            record['payload'] = summary_df
+
+    with profiler.stage('flagged', rows_in=len(flagged_df)) as record:
+        record['payload'] = flagged(flagged_df)
+
+    with profiler.stage('transactions', rows_in=len(filtered_df)) as record:
+        transactions_df = transactions(filtered_df)
+        record['rows_out'] = len(transactions_df)
+        record['payload'] = transactions_df
 
 else:
     colk1, colk2, colk3 = st.columns((2.7, 2.7, 2.7), gap='medium')
@@ -209,5 +529,16 @@ else:
             """,
             unsafe_allow_html=True
         )
+    profiler.mark('first_render')
     st.warning(
         'Please enter names or phone numbers, or account numbers to view the data.')
+
+profiler.mark('last_render')
+if profiler.enabled:
+    profiler.flush(version=version, selection=selection_key)
+    with st.sidebar.expander('Profiling', expanded=False):
+        st.dataframe(pd.DataFrame(profiler.records), hide_index=True)
+        stats = chart_cache.stats()
+        st.caption(
+            f"Chart cache: {stats['hits']} hits, {stats['misses']} misses, "
+            f"{stats['entries']} entries, {stats['bytes'] / 1024 ** 2:.1f} MB")
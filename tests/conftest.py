@@ -0,0 +1,15 @@
+import pytest
+
+from benchmarks.synthetic import generate_transactions
+
+
+# Small synthetic export shared by the tests; the frames are never modified
+@pytest.fixture(scope='session')
+def transactions():
+    return generate_transactions(3000, n_accounts=300, seed=7)
+
+
+# The same transactions with timestamps cut to the day, so many of them tie
+@pytest.fixture(scope='session')
+def daily_transactions(transactions):
+    return transactions.assign(**{'Date and Time': transactions['Date and Time'].dt.floor('D')})
@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from transformations.adjacency import build_adjacency, expand_selection, extend_adjacency
+
+
+# Reference expansion as a breadth-first search over rows: a row continues
+# every row into its sender (out) or out of its receiver (in), and with
+# time_ordered only when money keeps moving forward in time
+def naive_expand(df, positions, hops, direction='both', time_ordered=False, min_amount=None):
+    sender = df['Sender Account'].to_numpy(dtype=object)
+    receiver = df['Receiver Account'].to_numpy(dtype=object)
+    times = df['Date and Time'].to_numpy()
+    amounts = df['Amount'].to_numpy()
+    sides = ('out', 'in') if direction == 'both' else (direction,)
+    included = np.zeros(len(df), dtype=bool)
+    included[positions] = True
+    frontier = np.asarray(positions)
+    for _ in range(hops - 1):
+        found = np.zeros(len(df), dtype=bool)
+        for row in frontier:
+            for side in sides:
+                if side == 'out':
+                    follows = sender == receiver[row]
+                    if time_ordered:
+                        follows &= times >= times[row]
+                else:
+                    follows = receiver == sender[row]
+                    if time_ordered:
+                        follows &= times <= times[row]
+                found |= follows
+        if min_amount:
+            found &= amounts >= min_amount
+        found &= ~included
+        if not found.any():
+            break
+        included |= found
+        frontier = np.flatnonzero(found)
+    return np.flatnonzero(included)
+
+
+def seed_positions(df, n_accounts=3):
+    accounts = df['Sender Account'].astype(object).unique()[:n_accounts]
+    return np.flatnonzero(df['Sender Account'].isin(accounts).to_numpy())
+
+
+def test_csr_holds_the_edges_of_every_account_in_time_order(transactions):
+    adjacency = build_adjacency(transactions)
+    accounts = adjacency['accounts']
+    for side, column in (('out', 'Sender Account'), ('in', 'Receiver Account')):
+        csr = adjacency[side]
+        node = transactions[column].to_numpy(dtype=object)
+        assert csr['indptr'][-1] == len(transactions)
+        for code in range(0, len(accounts), 17):
+            start, end = csr['indptr'][code], csr['indptr'][code + 1]
+            rows = csr['rows'][start:end]
+            assert sorted(rows) == list(np.flatnonzero(node == accounts[code]))
+            assert np.all(np.diff(csr['times'][start:end]) >= 0)
+
+
+@pytest.mark.parametrize('direction', ['both', 'out', 'in'])
+@pytest.mark.parametrize('hops', [1, 2, 3])
+def test_expansion_matches_naive_bfs(transactions, direction, hops):
+    positions = seed_positions(transactions)
+    expected = naive_expand(transactions, positions, hops, direction)
+    result = expand_selection(build_adjacency(transactions), positions, hops, direction)
+    np.testing.assert_array_equal(result, expected)
+
+
+@pytest.mark.parametrize('frame', ['transactions', 'daily_transactions'])
+@pytest.mark.parametrize('direction', ['both', 'out', 'in'])
+@pytest.mark.parametrize('hops', [3, 5])
+def test_time_ordered_expansion_matches_naive_bfs(request, frame, direction, hops):
+    df = request.getfixturevalue(frame)
+    positions = seed_positions(df)
+    expected = naive_expand(df, positions, hops, direction, time_ordered=True)
+    result = expand_selection(build_adjacency(df), positions, hops, direction, time_ordered=True)
+    np.testing.assert_array_equal(result, expected)
+    assert len(result) < len(naive_expand(df, positions, hops, direction))
+
+
+def test_expansion_skips_edges_below_min_amount(transactions):
+    positions = seed_positions(transactions)
+    expected = naive_expand(transactions, positions, 3, min_amount=1000)
+    result = expand_selection(build_adjacency(transactions), positions, 3, min_amount=1000)
+    np.testing.assert_array_equal(result, expected)
+
+
+@pytest.mark.parametrize('frame', ['transactions', 'daily_transactions'])
+@pytest.mark.parametrize('offset', [0, 1, 2000, 2999])
+def test_extended_adjacency_expands_like_a_rebuild(request, frame, offset):
+    df = request.getfixturevalue(frame)
+    extended = extend_adjacency(build_adjacency(df.iloc[:offset]), df, offset)
+    rebuilt = build_adjacency(df)
+    positions = seed_positions(df)
+    for time_ordered in (False, True):
+        np.testing.assert_array_equal(
+            expand_selection(extended, positions, 3, time_ordered=time_ordered),
+            expand_selection(rebuilt, positions, 3, time_ordered=time_ordered))
+
+
+def test_later_hop_with_an_earlier_arrival_expands_again():
+    # A->X on day 10 reaches X too late for X->Y on day 5, but A->B->X
+    # arrives on day 3
+    df = pd.DataFrame({
+        'Sender Account': ['A', 'A', 'B', 'X'],
+        'Receiver Account': ['X', 'B', 'X', 'Y'],
+        'Date and Time': pd.to_datetime(['2024-01-10', '2024-01-01', '2024-01-03', '2024-01-05']),
+        'Amount': [1.0, 1.0, 1.0, 1.0],
+    })
+    adjacency = build_adjacency(df)
+    np.testing.assert_array_equal(
+        expand_selection(adjacency, [0, 1], 3, 'out', time_ordered=True), [0, 1, 2, 3])
+    np.testing.assert_array_equal(
+        expand_selection(adjacency, [0, 1], 2, 'out', time_ordered=True), [0, 1, 2])
+    np.testing.assert_array_equal(naive_expand(df, [0, 1], 3, 'out', time_ordered=True), [0, 1, 2, 3])
+
+
+def test_later_hop_with_a_later_departure_expands_again():
+    # Mirror of the case above, traced back from Y
+    df = pd.DataFrame({
+        'Sender Account': ['X', 'B', 'X', 'A'],
+        'Receiver Account': ['Y', 'Y', 'B', 'X'],
+        'Date and Time': pd.to_datetime(['2024-01-01', '2024-01-10', '2024-01-08', '2024-01-06']),
+        'Amount': [1.0, 1.0, 1.0, 1.0],
+    })
+    adjacency = build_adjacency(df)
+    np.testing.assert_array_equal(
+        expand_selection(adjacency, [0, 1], 3, 'in', time_ordered=True), [0, 1, 2, 3])
+    np.testing.assert_array_equal(naive_expand(df, [0, 1], 3, 'in', time_ordered=True), [0, 1, 2, 3])
@@ -0,0 +1,148 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from transformations.accounts import build_accounts
+from transformations.edges import aggregate_edges
+from transformations.index import FILTER_FIELDS, build_filter_index, filter_options
+from transformations.ingest import load_transactions
+from transformations.report import select
+from transformations.sql import SqlBackend
+from transformations.summary import account_summary, involved_accounts
+
+COLUMNS = ['ID', 'Sender Account', 'Receiver Account', 'Sender Name', 'Amount', 'Date and Time']
+
+
+class PandasBackend:
+    # The in-memory path of the dashboard behind the interface of SqlBackend
+
+    def __init__(self, path):
+        self.frame = load_transactions(path)
+        self.index = build_filter_index(self.frame)
+        self.accounts = build_accounts(self.frame)
+
+    def options(self, field):
+        return filter_options(self.index, field)
+
+    def filter(self, selections, columns=None):
+        rows, _ = select(self.frame, self.index, selections)
+        return rows[columns] if columns else rows
+
+    def metrics(self, selections):
+        return select(self.frame, self.index, selections)[1]
+
+    def edges(self, selections):
+        return aggregate_edges(self.filter(selections))
+
+    def value_counts(self, selections, column):
+        return self.filter(selections)[column].astype(object).value_counts()
+
+    def account_summary(self, accounts):
+        return account_summary(self.frame, accounts, self.accounts)
+
+
+@pytest.fixture(scope='module')
+def export(transactions, tmp_path_factory):
+    directory = tmp_path_factory.mktemp('export')
+    path = directory / 'export.csv'
+    transactions.to_csv(path, index=False)
+    return directory, str(path)
+
+
+# Backends are built in the export's directory, which holds their data/.cache
+@pytest.fixture(scope='module', params=['pandas', 'sqlite'])
+def backend(request, export):
+    directory, path = export
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.chdir(directory)
+        yield PandasBackend(path) if request.param == 'pandas' else SqlBackend(path)
+
+
+@pytest.fixture(scope='module')
+def source(export):
+    directory, path = export
+    return load_transactions(path, cache_dir=str(directory / 'source'))
+
+
+SELECTIONS = {
+    'one name': lambda df: {'name': [df['Sender Name'].iloc[0]]},
+    'several fields': lambda df: {'name': [df['Receiver Name'].iloc[5]],
+                                  'phone': [df['Sender Phone Number'].iloc[9]],
+                                  'account': list(df['Receiver Account'].iloc[20:23])},
+    'overlapping': lambda df: {'name': [df['Sender Name'].iloc[0]],
+                               'account': [df['Sender Account'].iloc[0]]},
+    'unknown': lambda df: {'name': ['Nobody']},
+    'nothing': lambda df: {'name': [], 'phone': [], 'account': []},
+}
+
+
+def expected_rows(df, selections):
+    matched = np.zeros(len(df), dtype=bool)
+    for field, values in selections.items():
+        for column in FILTER_FIELDS[field]:
+            matched |= df[column].astype(object).isin(values).to_numpy()
+    return df[matched]
+
+
+@pytest.mark.parametrize('field', list(FILTER_FIELDS))
+def test_options_list_every_value_once(backend, source, field):
+    values = pd.unique(np.concatenate([source[column].to_numpy(dtype=object)
+                                       for column in FILTER_FIELDS[field]]))
+    assert list(backend.options(field)) == sorted(values)
+
+
+@pytest.mark.parametrize('name', list(SELECTIONS))
+def test_filter_returns_the_matching_rows_in_order(backend, source, name):
+    selections = SELECTIONS[name](source)
+    rows = backend.filter(selections, COLUMNS)
+    expected = expected_rows(source, selections)
+    assert list(rows.columns) == COLUMNS
+    assert list(rows['ID']) == list(expected['ID'])
+    np.testing.assert_allclose(rows['Amount'], expected['Amount'])
+    assert (rows['Date and Time'].to_numpy() == expected['Date and Time'].to_numpy()).all()
+
+
+@pytest.mark.parametrize('name', list(SELECTIONS))
+def test_metrics_count_the_matching_rows(backend, source, name):
+    selections = SELECTIONS[name](source)
+    expected = expected_rows(source, selections)
+    metrics = backend.metrics(selections)
+    assert metrics['transactions'] == len(expected)
+    assert metrics['amount'] == pytest.approx(expected['Amount'].sum())
+    assert metrics['accounts'] == len(set(expected['Sender Account']) | set(expected['Receiver Account']))
+
+
+@pytest.mark.parametrize('name', list(SELECTIONS))
+def test_edges_match_the_aggregated_rows(backend, source, name):
+    selections = SELECTIONS[name](source)
+    expected_nodes, expected_edges = aggregate_edges(expected_rows(source, selections))
+    nodes, edges = backend.edges(selections)
+    # Same node and edge order as the rows give, so the graphs are identical
+    assert list(nodes['label']) == list(expected_nodes['label'])
+    assert list(edges['source']) == list(expected_edges['source'])
+    assert list(edges['target']) == list(expected_edges['target'])
+    assert list(edges['sender']) == list(expected_edges['sender'])
+    assert list(edges['count']) == list(expected_edges['count'])
+    np.testing.assert_allclose(edges['amount'], expected_edges['amount'])
+
+
+@pytest.mark.parametrize('column', ['Transaction Type', 'Sender Name'])
+@pytest.mark.parametrize('name', list(SELECTIONS))
+def test_value_counts_count_the_matching_rows(backend, source, name, column):
+    selections = SELECTIONS[name](source)
+    expected = expected_rows(source, selections)[column].astype(object).value_counts()
+    counts = backend.value_counts(selections, column)
+    assert dict(counts) == dict(expected)
+
+
+def test_account_summary_matches_the_pandas_summary(backend, source):
+    rows = expected_rows(source, SELECTIONS['several fields'](source))
+    accounts = list(involved_accounts(rows)) + ['unknown account']
+    expected = account_summary(source, accounts)
+    summary = backend.account_summary(accounts)
+    pd.testing.assert_frame_equal(summary, expected, check_exact=False)
+    # Branch breakdowns come in branch order from both backends
+    for column in ('Branches Involved (Sent)', 'Branches Involved (Received)'):
+        for breakdown in summary[column]:
+            if isinstance(breakdown, dict):
+                assert list(breakdown) == sorted(breakdown)
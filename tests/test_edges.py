@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from transformations.edges import OTHER_LABEL, aggregate_edges, encode_nodes, prune_edges
+
+
+@pytest.fixture(scope='module')
+def graph(transactions):
+    return aggregate_edges(transactions.iloc[:1500])
+
+
+# Reference pruning on labels: the top_k nodes by summed edge weight are kept
+# and the others renamed to one collapsed label
+def naive_prune(edges, top_k, by='amount', min_amount=None):
+    if min_amount:
+        edges = edges[edges['amount'] >= min_amount]
+    weight = pd.concat([edges.groupby('sender')[by].sum(),
+                        edges.groupby('receiver')[by].sum()]).groupby(level=0).sum()
+    kept = set(weight.sort_values(ascending=False).index[:top_k])
+    other = f'{OTHER_LABEL} ({len(weight) - len(kept)})'
+    renamed = pd.DataFrame({
+        'sender': edges['sender'].where(edges['sender'].isin(kept), other),
+        'receiver': edges['receiver'].where(edges['receiver'].isin(kept), other),
+        'amount': edges['amount'], 'count': edges['count'],
+    })
+    renamed = renamed[(renamed['sender'] != other) | (renamed['receiver'] != other)]
+    return kept, other, renamed.groupby(['sender', 'receiver'])[['amount', 'count']].sum()
+
+
+def test_aggregated_edges_sum_every_pair(transactions):
+    rows = transactions.iloc[:1500]
+    nodes, edges = aggregate_edges(rows)
+    expected = rows.astype({'Sender Name': object, 'Receiver Name': object}).groupby(
+        ['Sender Name', 'Receiver Name'])['Amount'].agg(['sum', 'size'])
+    result = edges.set_index(['sender', 'receiver']).sort_index()
+    np.testing.assert_allclose(result['amount'], expected['sum'])
+    np.testing.assert_array_equal(result['count'], expected['size'])
+    codes, labels = encode_nodes(rows)
+    assert list(nodes['label']) == list(labels)
+    assert labels[codes[0]] == rows['Sender Name'].iloc[0]
+
+
+def test_without_limits_the_graph_is_unchanged(graph):
+    nodes, edges = graph
+    pruned_nodes, pruned_edges, codes = prune_edges(nodes, edges)
+    assert pruned_nodes is nodes and pruned_edges is edges
+    np.testing.assert_array_equal(codes, np.arange(len(nodes)))
+
+
+@pytest.mark.parametrize('by', ['amount', 'count'])
+@pytest.mark.parametrize('top_k', [1, 10, 50])
+def test_nodes_outside_top_k_collapse_into_other(graph, top_k, by):
+    nodes, edges = graph
+    pruned_nodes, pruned_edges, codes = prune_edges(nodes, edges, top_k, by)
+    kept, other, expected = naive_prune(edges, top_k, by)
+
+    labels = list(pruned_nodes['label'])
+    assert set(labels[:-1]) == kept and labels[-1] == other
+    result = pruned_edges.groupby(['sender', 'receiver'])[['amount', 'count']].sum()
+    pd.testing.assert_frame_equal(result, expected, check_exact=False)
+    assert not ((pruned_edges['sender'] == other) & (pruned_edges['receiver'] == other)).any()
+    # Every original node points at its kept node or at "Other"
+    original = nodes['label'].to_numpy(dtype=object)
+    for code, new in enumerate(codes):
+        assert labels[new] == (original[code] if original[code] in kept else other)
+
+
+def test_min_amount_drops_edges_and_their_isolated_nodes(graph):
+    nodes, edges = graph
+    pruned_nodes, pruned_edges, codes = prune_edges(nodes, edges, min_amount=20000)
+    assert (pruned_edges['amount'] >= 20000).all()
+    assert len(pruned_edges) == (edges['amount'] >= 20000).sum()
+    remaining = set(pruned_edges['sender']) | set(pruned_edges['receiver'])
+    assert set(pruned_nodes['label']) == remaining
+    assert (codes == -1).sum() == len(nodes) - len(remaining)
+
+
+def test_min_amount_is_applied_before_ranking(graph):
+    nodes, edges = graph
+    pruned_nodes, pruned_edges, _ = prune_edges(nodes, edges, 5, min_amount=20000)
+    kept, other, expected = naive_prune(edges, 5, min_amount=20000)
+    assert set(pruned_nodes['label'][:-1]) == kept
+    result = pruned_edges.groupby(['sender', 'receiver'])[['amount', 'count']].sum()
+    pd.testing.assert_frame_equal(result, expected, check_exact=False)
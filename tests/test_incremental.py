@@ -0,0 +1,207 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from graphs.timeline import daily_rollups, extend_rollups
+from transformations.geo import branch_tables, extend_branch_tables
+from transformations.incremental import IncrementalDataset
+from transformations.index import filter_positions
+from transformations.ingest import delta_paths, source_version, write_delta
+from transformations.summary import totals_summary
+from transformations.timeindex import build_time_index, extend_time_index
+
+BATCHES = [(0, 2000), (2000, 2600), (2600, 3000)]
+
+
+# Writes the frame as a CSV export in a scratch directory; the store and the
+# delta batches go to its data/.cache
+@pytest.fixture
+def export(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    def write(df, name):
+        path = str(tmp_path / name)
+        df.to_csv(path, index=False)
+        return path
+    return write
+
+
+@pytest.fixture
+def datasets(transactions, export):
+    appended = IncrementalDataset(export(transactions.iloc[:BATCHES[0][1]], 'base.csv'))
+    # Derived structures are built on the first batch, then extended
+    derived = [derive(appended, appended.snapshot())]
+    for start, end in BATCHES[1:]:
+        assert appended.append(transactions.iloc[start:end]) == end - start
+        derived.append(derive(appended, appended.snapshot()))
+    rebuilt = IncrementalDataset(export(transactions, 'full.csv'))
+    return appended, rebuilt, derived[-1], derive(rebuilt, rebuilt.snapshot())
+
+
+def derive(dataset, snapshot):
+    accounts = snapshot['accounts']
+    return {
+        'time_index': dataset.derived('time_index', snapshot, build_time_index, extend_time_index),
+        'rollups': dataset.derived(
+            'rollups', snapshot, lambda frame: daily_rollups(frame, accounts),
+            lambda rollups, frame, offset: extend_rollups(rollups, frame, offset, accounts)),
+        'branches': dataset.derived(
+            'branches', snapshot, lambda frame: branch_tables(frame, accounts),
+            lambda tables, frame, offset: extend_branch_tables(tables, frame, offset, accounts)),
+    }
+
+
+def test_appended_frame_matches_the_full_load(datasets):
+    appended, rebuilt, _, _ = datasets
+    pd.testing.assert_frame_equal(appended.frame, rebuilt.frame, check_categorical=False)
+    assert appended.version != appended.base_version
+
+
+def test_append_skips_loaded_ids(datasets, transactions):
+    appended = datasets[0]
+    version = appended.version
+    assert appended.append(transactions.iloc[100:200]) == 0
+    assert appended.version == version
+
+
+def test_filter_index_matches_the_full_load(datasets, transactions):
+    appended, rebuilt, _, _ = datasets
+    for field, column in (('name', 'Sender Name'), ('account', 'Receiver Account'),
+                          ('phone', 'Sender Phone Number')):
+        # Values first seen in every batch
+        values = [transactions[column].iloc[row] for row in (0, 2100, 2900)]
+        selections = {field: values}
+        np.testing.assert_array_equal(filter_positions(appended.index, selections),
+                                      filter_positions(rebuilt.index, selections))
+
+
+def test_account_dimension_matches_the_full_load(datasets):
+    appended, rebuilt, _, _ = datasets
+    pd.testing.assert_frame_equal(appended.accounts.sort_index(), rebuilt.accounts.sort_index())
+
+
+def test_folded_totals_summarize_like_the_full_load(datasets):
+    appended, rebuilt, _, _ = datasets
+    accounts = rebuilt.accounts.index
+    expected = totals_summary(rebuilt.totals, accounts, rebuilt.accounts)
+    result = totals_summary(appended.totals, accounts, appended.accounts)
+    pd.testing.assert_frame_equal(result, expected, check_exact=False)
+
+
+def test_extended_time_index_matches_a_rebuild(datasets):
+    _, _, extended, built = datasets
+    for key in ('order', 'times'):
+        np.testing.assert_array_equal(extended['time_index'][key], built['time_index'][key])
+
+
+def test_extended_rollups_match_a_rebuild(datasets):
+    _, _, extended, built = datasets
+
+    def ordered(rollups):
+        return rollups.sort_values(['Date and Time', 'Account'], kind='stable').reset_index(drop=True)
+    pd.testing.assert_frame_equal(ordered(extended['rollups']), ordered(built['rollups']),
+                                  check_exact=False, check_categorical=False)
+
+
+def test_extended_branch_tables_match_a_rebuild(datasets):
+    _, _, extended, built = datasets
+    branches, flows = extended['branches']
+    expected_branches, expected_flows = built['branches']
+    columns = ['lat', 'lon', 'people']
+    pd.testing.assert_frame_equal(branches[columns].sort_index(),
+                                  expected_branches[columns].sort_index())
+
+    def labelled(branches, flows):
+        labels = branches.index.to_numpy(dtype=object)
+        return pd.DataFrame({
+            'source': labels[flows['source']], 'target': labels[flows['target']],
+            'amount': flows['amount'].to_numpy(), 'count': flows['count'].to_numpy(),
+        }).sort_values(['source', 'target']).reset_index(drop=True)
+    pd.testing.assert_frame_equal(labelled(branches, flows),
+                                  labelled(expected_branches, expected_flows), check_exact=False)
+
+
+def test_older_snapshot_is_built_without_caching(transactions, export):
+    dataset = IncrementalDataset(export(transactions.iloc[:2000], 'base.csv'))
+    old = dataset.snapshot()
+    dataset.append(transactions.iloc[2000:])
+    new = dataset.snapshot()
+    calls = []
+
+    def build(frame):
+        calls.append(len(frame))
+        return build_time_index(frame)
+    dataset.derived('time_index', new, build, extend_time_index)
+    assert len(dataset.derived('time_index', old, build, extend_time_index)['order']) == 2000
+    dataset.derived('time_index', new, build, extend_time_index)
+    assert calls == [3000, 2000]
+
+
+def test_batch_missing_columns_is_rejected_and_not_saved(transactions, export):
+    path = export(transactions.iloc[:2000], 'base.csv')
+    dataset = IncrementalDataset(path)
+    version = dataset.version
+    with pytest.raises(ValueError, match='Amount'):
+        dataset.append(transactions.iloc[2000:2100].drop(columns='Amount'))
+    assert dataset.version == version and len(dataset.frame) == 2000
+    # Nothing was persisted, so a restart loads the source alone
+    assert len(IncrementalDataset(path).frame) == 2000
+    assert dataset.append(transactions.iloc[2000:2100]) == 100
+    assert len(IncrementalDataset(path).frame) == 2100
+
+
+# Two datasets on the same source stand in for two worker processes
+def test_batches_appended_elsewhere_are_seen_on_refresh(transactions, export):
+    path = export(transactions.iloc[:2000], 'base.csv')
+    first, second = IncrementalDataset(path), IncrementalDataset(path)
+    assert first.append(transactions.iloc[2000:2500]) == 500
+    assert second.refresh() == 1 and second.refresh() == 0
+    # Appending catches up first, so both apply the batches in the same order
+    assert second.append(transactions.iloc[2500:]) == 500
+    assert first.refresh() == 1
+    assert first.version == second.version
+    pd.testing.assert_frame_equal(first.frame, second.frame, check_categorical=False)
+    np.testing.assert_array_equal(first.frame['ID'], transactions['ID'])
+
+
+def test_concurrent_appends_keep_every_batch(transactions, export):
+    path = export(transactions.iloc[:2000], 'base.csv')
+    datasets = [IncrementalDataset(path) for _ in range(4)]
+    batches = [transactions.iloc[start:start + 250] for start in range(2000, 3000, 250)]
+    with ThreadPoolExecutor(4) as pool:
+        assert list(pool.map(IncrementalDataset.append, datasets, batches)) == [250] * 4
+    for dataset in datasets:
+        dataset.refresh()
+        assert len(dataset.frame) == 3000 and dataset.version == datasets[0].version
+        pd.testing.assert_frame_equal(dataset.frame, datasets[0].frame, check_categorical=False)
+    assert len(IncrementalDataset(path).frame) == 3000
+
+
+def test_concurrent_delta_writes_take_distinct_sequence_numbers(transactions, export):
+    path = export(transactions.iloc[:10], 'base.csv')
+    version = source_version(path)
+    with ThreadPoolExecutor(8) as pool:
+        written = list(pool.map(lambda start: write_delta(path, version, transactions.iloc[start:start + 1]),
+                                range(10, 26)))
+    assert len(set(written)) == 16 and sorted(written) == delta_paths(path, version)
+
+
+def test_shared_frame_is_mapped_from_one_store_per_version(transactions, export, tmp_path):
+    path = export(transactions.iloc[:2000], 'base.csv')
+    shared_dir = str(tmp_path / 'shm')
+    first = IncrementalDataset(path, shared_dir=shared_dir)
+    second = IncrementalDataset(path, shared_dir=shared_dir)
+    first.append(transactions.iloc[2000:2500])
+    stores = sorted(os.listdir(shared_dir))
+    assert len(stores) == 2 and stores[0].endswith('+1.arrow')
+    second.refresh()
+    pd.testing.assert_frame_equal(first.frame, second.frame)
+    # The appended frame is a view over the mapped store, not a private copy
+    assert not second.frame['Date and Time'].to_numpy().flags.writeable
+    second.append(transactions.iloc[2500:])
+    stores = sorted(os.listdir(shared_dir))
+    assert len(stores) == 2 and stores[0].endswith('+2.arrow')
+    assert len(IncrementalDataset(path, shared_dir=shared_dir).frame) == 3000
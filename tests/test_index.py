@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from transformations.index import (FILTER_FIELDS, build_filter_index, extend_filter_index,
+                                   filter_options, filter_positions)
+
+OFFSET = 2000
+
+
+@pytest.fixture(scope='module')
+def frame(transactions):
+    return transactions.astype({column: object for columns in FILTER_FIELDS.values()
+                                for column in columns})
+
+
+@pytest.fixture(scope='module')
+def index(frame):
+    return build_filter_index(frame)
+
+
+def matching_positions(df, selections):
+    matched = np.zeros(len(df), dtype=bool)
+    for field, values in selections.items():
+        for column in FILTER_FIELDS[field]:
+            matched |= df[column].isin(values).to_numpy()
+    return np.flatnonzero(matched)
+
+
+# Name, phone and account of the same parties select largely the same rows
+SELECTIONS = {
+    'same party': lambda df: {'name': [df['Sender Name'].iloc[0]],
+                              'phone': [df['Sender Phone Number'].iloc[0]],
+                              'account': [df['Sender Account'].iloc[0]]},
+    'both sides': lambda df: {'name': [df['Sender Name'].iloc[0], df['Receiver Name'].iloc[0]],
+                              'phone': [df['Receiver Phone Number'].iloc[0]],
+                              'account': [df['Sender Account'].iloc[0],
+                                          df['Receiver Account'].iloc[0]]},
+    'value twice': lambda df: {'name': [df['Sender Name'].iloc[3]] * 2,
+                               'account': [df['Sender Account'].iloc[3]]},
+    'unknown values': lambda df: {'name': ['Nobody'], 'phone': [df['Sender Phone Number'].iloc[5]],
+                                  'account': []},
+}
+
+
+@pytest.mark.parametrize('name', list(SELECTIONS))
+def test_overlapping_selections_return_each_row_once(frame, index, name):
+    selections = SELECTIONS[name](frame)
+    positions = filter_positions(index, selections)
+    assert (np.diff(positions) > 0).all()
+    np.testing.assert_array_equal(positions, matching_positions(frame, selections))
+
+
+def test_empty_selection_matches_nothing(index):
+    assert len(filter_positions(index, {'name': [], 'phone': [], 'account': []})) == 0
+
+
+# The delta gets a party that is not in the loaded rows, so new options appear
+@pytest.fixture(scope='module')
+def extended(frame, index):
+    delta = frame.iloc[OFFSET:].copy()
+    delta.iloc[:4, delta.columns.get_loc('Sender Name')] = 'New Sender'
+    delta.iloc[:2, delta.columns.get_loc('Receiver Phone Number')] = 'New Phone'
+    base = build_filter_index(frame.iloc[:OFFSET])
+    options = {field: list(filter_options(base, field)) for field in FILTER_FIELDS}
+    extended = extend_filter_index(base, delta, OFFSET)
+    full = pd.concat([frame.iloc[:OFFSET], delta], ignore_index=True)
+    return base, options, extended, full
+
+
+@pytest.mark.parametrize('field', list(FILTER_FIELDS))
+def test_extended_options_match_a_rebuild(extended, field):
+    _, _, extended_index, full = extended
+    assert filter_options(extended_index, field) == filter_options(build_filter_index(full), field)
+
+
+def test_new_values_become_options(extended):
+    _, options, extended_index, _ = extended
+    assert 'New Sender' not in options['name']
+    assert 'New Sender' in filter_options(extended_index, 'name')
+    assert 'New Phone' in filter_options(extended_index, 'phone')
+
+
+@pytest.mark.parametrize('field', list(FILTER_FIELDS))
+def test_extended_positions_match_a_rebuild(extended, field):
+    _, _, extended_index, full = extended
+    rebuilt = build_filter_index(full)[field]['positions']
+    positions = extended_index[field]['positions']
+    assert set(positions) == set(rebuilt)
+    for value, rows in rebuilt.items():
+        np.testing.assert_array_equal(positions[value], rows)
+
+
+def test_extending_leaves_the_index_unchanged(extended):
+    base, options, _, _ = extended
+    for field in FILTER_FIELDS:
+        assert filter_options(base, field) == options[field]
+    assert 'New Sender' not in base['name']['positions']
+
+
+def test_selections_after_extending_match_the_rows(extended):
+    _, _, extended_index, full = extended
+    selections = {'name': ['New Sender', full['Receiver Name'].iloc[OFFSET + 10]],
+                  'account': [full['Sender Account'].iloc[0]]}
+    np.testing.assert_array_equal(filter_positions(extended_index, selections),
+                                  matching_positions(full, selections))
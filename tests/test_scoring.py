@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_transactions
+from transformations.ingest import empty_frame
+from transformations.scoring import (BURST_COUNT, MIN_HISTORY, ROUND_TRIP_WINDOW, SCORE_COLUMNS,
+                                     VELOCITY_WINDOW, Z_THRESHOLD, amount_zscores, extend_scores,
+                                     flagged_transactions, round_trips, score_transactions,
+                                     velocity)
+
+
+# Few accounts trading within a month, so bursts and round trips are common
+@pytest.fixture(scope='module')
+def busy():
+    df = generate_transactions(800, n_accounts=15, seed=11)
+    start = df['Date and Time'].iloc[0]
+    return df.assign(**{'Date and Time': (start + (df['Date and Time'] - start) / 12).dt.floor('min')})
+
+
+def columns(df):
+    return (df['Sender Account'].to_numpy(dtype=object), df['Receiver Account'].to_numpy(dtype=object),
+            df['Date and Time'].to_numpy(), df['Amount'].to_numpy(dtype='float64'))
+
+
+def test_velocity_matches_naive_windows(busy):
+    sender, _, times, amounts = columns(busy)
+    count, total = velocity(busy)
+    for row in range(len(busy)):
+        window = (sender == sender[row]) & (times <= times[row]) & (
+            times >= times[row] - VELOCITY_WINDOW.to_timedelta64())
+        assert count[row] == window.sum()
+        assert total[row] == pytest.approx(amounts[window].sum())
+    assert count.max() >= BURST_COUNT
+
+
+def test_zscores_match_the_sender_history(busy):
+    sender, _, _, amounts = columns(busy)
+    z = amount_zscores(busy)
+    for row in range(len(busy)):
+        history = amounts[sender == sender[row]]
+        if len(history) < MIN_HISTORY or history.std(ddof=1) == 0:
+            assert np.isnan(z[row])
+        else:
+            assert z[row] == pytest.approx((amounts[row] - history.mean()) / history.std(ddof=1))
+
+
+def test_round_trips_match_naive_search(busy):
+    sender, receiver, times, _ = columns(busy)
+    result = round_trips(busy)
+    for row in range(len(busy)):
+        back = (sender == receiver[row]) & (receiver == sender[row]) & (times >= times[row]) & (
+            times <= times[row] + ROUND_TRIP_WINDOW.to_timedelta64())
+        assert result[row] == back.any()
+    assert result.any()
+
+
+def test_score_adds_up_the_signals(busy):
+    scores = score_transactions(busy)
+    expected = (np.nan_to_num(scores['Amount Z-Score'].abs()) / Z_THRESHOLD +
+                scores['Velocity'] / BURST_COUNT + scores['Round Trip'])
+    np.testing.assert_allclose(scores['Score'], expected)
+    assert list(scores.columns) == SCORE_COLUMNS
+
+
+def test_flagged_transactions_are_ranked_by_score(busy):
+    scores = score_transactions(busy)
+    flagged = flagged_transactions(busy.iloc[::2], scores)
+    assert len(flagged) and flagged.index.isin(busy.index[::2]).all()
+    assert flagged['Score'].is_monotonic_decreasing
+    assert (flagged['Flags'] != '').all()
+
+
+def test_empty_frame_scores_are_typed():
+    scores = score_transactions(empty_frame())
+    assert list(scores.columns) == SCORE_COLUMNS
+    assert scores.dtypes.tolist() == [np.dtype(dtype) for dtype in
+                                      ('int64', 'float64', 'float64', 'bool', 'float64')]
+
+
+@pytest.mark.parametrize('offset', [0, 1, 400, 790, 799])
+def test_extended_scores_match_a_rescore(busy, offset):
+    extended = extend_scores(score_transactions(busy.iloc[:offset]), busy, offset)
+    pd.testing.assert_frame_equal(extended, score_transactions(busy), check_exact=False)
+
+
+def test_extended_scores_leave_unrelated_rows_alone(transactions):
+    scores = score_transactions(transactions.iloc[:2990])
+    extended = extend_scores(scores, transactions, 2990)
+    delta = transactions.iloc[2990:]
+    touched = set(delta['Sender Account']) | set(delta['Receiver Account'])
+    unrelated = ~transactions['Sender Account'].iloc[:2990].isin(touched)
+    pd.testing.assert_frame_equal(extended.iloc[:2990][unrelated], scores[unrelated])
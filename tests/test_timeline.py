@@ -0,0 +1,34 @@
+import pandas as pd
+import pytest
+
+from graphs.timeline import candlestick_data_by_account, daily_rollups, selection_candles_by_account
+from transformations.accounts import build_accounts
+from transformations.index import build_filter_index
+from transformations.report import select
+from transformations.timeindex import build_time_index
+
+WINDOWS = [None, ('2023-03-01', '2023-08-31')]
+
+
+def ordered(candles):
+    return candles.sort_values(['Date and Time', 'Side', 'Transaction Type']).reset_index(drop=True)
+
+
+@pytest.mark.parametrize('window', WINDOWS)
+@pytest.mark.parametrize('freq', ['D', 'W', 'MS'])
+def test_selection_candles_match_the_selected_rows(transactions, freq, window):
+    dimension = build_accounts(transactions)
+    rollups = daily_rollups(transactions, dimension)
+    selections = {'name': list(transactions['Sender Name'].iloc[:3])}
+    rows, _ = select(transactions, build_filter_index(transactions), selections,
+                     time_index=build_time_index(transactions), window=window)
+    accounts = rows['Sender Account'].unique()
+    start, end = window or (None, None)
+
+    candles = selection_candles_by_account(rollups, rows, accounts, start, end, freq, dimension)
+    expected = candlestick_data_by_account(rows, freq=freq, accounts=dimension)
+    assert set(candles) == set(accounts)
+    for account in accounts:
+        result = ordered(candles[account])
+        pd.testing.assert_frame_equal(result[expected[account].columns],
+                                      ordered(expected[account]), check_categorical=False)
@@ -0,0 +1,60 @@
+import pandas as pd
+
+# Account attributes with their sender and receiver columns
+ACCOUNT_ATTRIBUTES = {
+    'name': ('Sender Name', 'Receiver Name'),
+    'type': ('Sender Account Type', 'Receiver Account Type'),
+    'branch': ('Sender Account Branch', 'Receiver Account Branch'),
+    'phone': ('Sender Phone Number', 'Receiver Phone Number'),
+}
+ACCOUNT_COLUMNS = list(ACCOUNT_ATTRIBUTES) + ['lat', 'lon', 'sender']
+
+# Function to take the attributes of each account from the first row it
+# appears in on one side
+
+
+def _side_attributes(df, side):
+    account = ('Sender Account', 'Receiver Account')[side]
+    columns = {column[side]: name for name, column in ACCOUNT_ATTRIBUTES.items()}
+    rows = df[[account] + list(columns)]
+    rows = rows[~rows[account].duplicated()]
+    attributes = rows[list(columns)].rename(columns=columns)
+    attributes.index = pd.Index(rows[account].to_numpy(dtype=object), name='account')
+    return attributes.astype(object)
+
+# Function to build the account dimension: one row per account with its name,
+# type, branch and phone, taken from the sender side and falling back to the
+# receiver side, and the branch coordinates parsed once. Attributes are looked
+# up with dimension.reindex(accounts), a hash lookup per account.
+
+
+def build_accounts(df):
+    sender = _side_attributes(df, 0)
+    accounts = sender.combine_first(_side_attributes(df, 1))
+    accounts = accounts[list(ACCOUNT_ATTRIBUTES)]
+    # An empty frame, or branches without a comma, split into fewer columns
+    coordinates = accounts['branch'].astype(str).str.split(
+        ', ', n=1, expand=True).reindex(columns=[0, 1])
+    accounts['lat'] = pd.to_numeric(coordinates[0], errors='coerce').astype('float64')
+    accounts['lon'] = pd.to_numeric(coordinates[1], errors='coerce').astype('float64')
+    # Whether the attributes come from the sender side, which takes precedence
+    accounts['sender'] = accounts.index.isin(sender.index)
+    return accounts[ACCOUNT_COLUMNS]
+
+# Function to return a new dimension that also covers the delta rows. New
+# accounts are added, and accounts only seen as receivers so far take their
+# sender-side attributes; the dimension passed in is left unchanged.
+
+
+def extend_accounts(accounts, delta):
+    delta_accounts = build_accounts(delta)
+    new = delta_accounts.index.difference(accounts.index)
+    upgraded = delta_accounts.index[delta_accounts['sender']].intersection(
+        accounts.index[~accounts['sender']])
+    if not len(new) and not len(upgraded):
+        return accounts
+    return pd.concat([
+        accounts.drop(upgraded),
+        delta_accounts.loc[upgraded],
+        delta_accounts.loc[new],
+    ])[ACCOUNT_COLUMNS]
@@ -0,0 +1,202 @@
+import numpy as np
+import pandas as pd
+
+# Directions a selection can be expanded in: following the money ('out'),
+# tracing where it came from ('in') or both
+DIRECTIONS = ('both', 'out', 'in')
+
+# Function to sort the edges by node and time into CSR arrays. keys orders
+# the edges by (node, time rank), so time ranges within a node are found
+# with one searchsorted over all nodes at once.
+
+
+def _csr(node, other, times, sorted_times, amounts, n_nodes):
+    order = np.lexsort((times, node))
+    node = node[order]
+    indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(node, minlength=n_nodes), out=indptr[1:])
+    times = times[order]
+    return {
+        'indptr': indptr,
+        'indices': other[order],
+        'rows': order,
+        'times': times,
+        'amounts': amounts[order],
+        'keys': node.astype(np.int64) * len(times) + np.searchsorted(sorted_times, times),
+    }
+
+# Function to build the adjacency index of the frame over account codes, with
+# outgoing edges by sender and incoming edges by receiver. Built once per
+# loaded source and extended as rows are appended.
+
+
+def build_adjacency(df):
+    n_rows = len(df)
+    stacked = np.concatenate([df['Sender Account'].to_numpy(dtype=object),
+                              df['Receiver Account'].to_numpy(dtype=object)])
+    codes, accounts = pd.factorize(stacked)
+    codes = codes.astype(np.int32)
+    sender, receiver = codes[:n_rows], codes[n_rows:]
+    times = df['Date and Time'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    amounts = df['Amount'].to_numpy(dtype='float64')
+    sorted_times = np.sort(times)
+    return {
+        'accounts': accounts,
+        'sender': sender,
+        'receiver': receiver,
+        'times': times,
+        'sorted_times': sorted_times,
+        'out': _csr(sender, receiver, times, sorted_times, amounts, len(accounts)),
+        'in': _csr(receiver, sender, times, sorted_times, amounts, len(accounts)),
+    }
+
+# Function to insert the edges of the appended rows into CSR arrays. The
+# keys of the loaded edges are moved to the new time ranks and new row
+# count, then every new edge goes after the loaded edges with the same key,
+# where lexsort would have put it.
+
+
+def _extend_csr(csr, node, other, rows, times, sorted_times, amounts, n_nodes):
+    n_old = len(csr['times'])
+    n_rows = n_old + len(rows)
+    old_node = np.repeat(np.arange(len(csr['indptr']) - 1), np.diff(csr['indptr']))
+    old_rank = csr['keys'] - old_node.astype(np.int64) * n_old
+    keys = (old_node.astype(np.int64) * n_rows + old_rank +
+            np.searchsorted(np.sort(times), csr['times']))
+
+    order = np.lexsort((times, node))
+    new_keys = node[order].astype(np.int64) * n_rows + np.searchsorted(sorted_times, times[order])
+    at = np.searchsorted(keys, new_keys, 'right')
+    node = np.insert(old_node, at, node[order])
+    indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(node, minlength=n_nodes), out=indptr[1:])
+    return {
+        'indptr': indptr,
+        'indices': np.insert(csr['indices'], at, other[order]),
+        'rows': np.insert(csr['rows'], at, rows[order]),
+        'times': np.insert(csr['times'], at, times[order]),
+        'amounts': np.insert(csr['amounts'], at, amounts[order]),
+        'keys': np.insert(keys, at, new_keys),
+    }
+
+# Function to fold the rows appended at offset into the adjacency index. New
+# accounts get the next codes, so the result holds the same edges as a
+# rebuild, under different account codes.
+
+
+def extend_adjacency(adjacency, df, offset):
+    delta = df.iloc[offset:]
+    n_rows = len(delta)
+    stacked = np.concatenate([delta['Sender Account'].to_numpy(dtype=object),
+                              delta['Receiver Account'].to_numpy(dtype=object)])
+    accounts = adjacency['accounts']
+    codes = pd.Index(accounts).get_indexer(stacked)
+    new = codes < 0
+    new_accounts = pd.unique(stacked[new])
+    codes[new] = len(accounts) + pd.Index(new_accounts).get_indexer(stacked[new])
+    accounts = np.concatenate([np.asarray(accounts, dtype=object), new_accounts])
+    codes = codes.astype(np.int32)
+    sender, receiver = codes[:n_rows], codes[n_rows:]
+
+    times = delta['Date and Time'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    amounts = delta['Amount'].to_numpy(dtype='float64')
+    new_times = np.sort(times)
+    sorted_times = np.insert(adjacency['sorted_times'],
+                             np.searchsorted(adjacency['sorted_times'], new_times), new_times)
+    rows = np.arange(offset, offset + n_rows)
+    return {
+        'accounts': accounts,
+        'sender': np.concatenate([adjacency['sender'], sender]),
+        'receiver': np.concatenate([adjacency['receiver'], receiver]),
+        'times': np.concatenate([adjacency['times'], times]),
+        'sorted_times': sorted_times,
+        'out': _extend_csr(adjacency['out'], sender, receiver, rows, times, sorted_times,
+                           amounts, len(accounts)),
+        'in': _extend_csr(adjacency['in'], receiver, sender, rows, times, sorted_times,
+                          amounts, len(accounts)),
+    }
+
+# Function to return the positions of the CSR edges in [start, end) for every
+# pair of bounds, without a Python loop
+
+
+def _gather(start, end):
+    lengths = end - start
+    offsets = np.cumsum(lengths) - lengths
+    return np.repeat(start - offsets, lengths) + np.arange(lengths.sum())
+
+# Function to expand matched rows by breadth-first search over the adjacency
+# index. The matched rows are hop 1; each further hop adds the edges of the
+# accounts reached in the previous one. With time_ordered, money has to move
+# forward in time along a path: an outgoing edge only continues a path if it
+# is not older than the edge that reached the account, and an incoming edge
+# only if it is not newer. An account is expanded again when a later hop
+# reaches it with a better bound, adding only the edges the old bound left
+# out. Returns the sorted row positions.
+
+
+def expand_selection(adjacency, positions, hops=1, direction='both', time_ordered=False,
+                     min_amount=None):
+    n_rows = len(adjacency['times'])
+    n_nodes = len(adjacency['accounts'])
+    included = np.zeros(n_rows, dtype=bool)
+    included[positions] = True
+    sides = ('out', 'in') if direction == 'both' else (direction,)
+    # Earliest arrival each account was expanded out of, and latest departure
+    # it was expanded into; without time_ordered every bound is the same
+    unset = {'out': np.iinfo(np.int64).max, 'in': np.iinfo(np.int64).min}
+    best = {side: np.full(n_nodes, unset[side], dtype=np.int64) for side in sides}
+
+    new_rows = np.asarray(positions)
+    for _ in range(hops - 1):
+        found = []
+        for side in sides:
+            csr = adjacency[side]
+            # Following money out of the receivers, or back into the senders
+            nodes = adjacency['receiver' if side == 'out' else 'sender'][new_rows]
+            times = adjacency['times'][new_rows]
+            if not time_ordered:
+                times = np.zeros(len(times), dtype=np.int64)
+            if side == 'out':
+                # Earliest arrival per node
+                order = np.lexsort((times, nodes))
+            else:
+                # Latest departure per node
+                order = np.lexsort((-times, nodes))
+            nodes, first = np.unique(nodes[order], return_index=True)
+            bounds = times[order][first]
+            previous = best[side][nodes]
+            improved = bounds < previous if side == 'out' else bounds > previous
+            nodes, bounds, previous = nodes[improved], bounds[improved], previous[improved]
+            best[side][nodes] = bounds
+            expanded = previous != unset[side]
+
+            start = csr['indptr'][nodes]
+            end = csr['indptr'][nodes + 1]
+            if time_ordered:
+                base = nodes.astype(np.int64) * n_rows
+                sorted_times = adjacency['sorted_times']
+                if side == 'out':
+                    start = np.searchsorted(
+                        csr['keys'], base + np.searchsorted(sorted_times, bounds))
+                    # Edges from the previous bound on were already added
+                    end = np.where(expanded, np.searchsorted(
+                        csr['keys'], base + np.searchsorted(
+                            sorted_times, np.where(expanded, previous, 0))), end)
+                else:
+                    end = np.searchsorted(
+                        csr['keys'], base + np.searchsorted(sorted_times, bounds, 'right'))
+                    start = np.where(expanded, np.searchsorted(
+                        csr['keys'], base + np.searchsorted(
+                            sorted_times, np.where(expanded, previous, 0), 'right')), start)
+            edges = _gather(start, np.maximum(start, end))
+            if min_amount:
+                edges = edges[csr['amounts'][edges] >= min_amount]
+            found.append(csr['rows'][edges])
+
+        new_rows = np.unique(np.concatenate(found)) if found else np.empty(0, dtype=np.int64)
+        new_rows = new_rows[~included[new_rows]]
+        if not len(new_rows):
+            break
+        included[new_rows] = True
+    return np.flatnonzero(included)
@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+
+# Function to encode sender and receiver into one shared set of node codes.
+# Sender and receiver of each row are interleaved, so node order follows the
+# order in which nodes first appear in the frame.
+
+
+def encode_nodes(df, sender='Sender Name', receiver='Receiver Name'):
+    stacked = np.column_stack(
+        [df[sender].to_numpy(dtype=object), df[receiver].to_numpy(dtype=object)]).ravel()
+    codes, labels = pd.factorize(stacked)
+    return codes, labels
+
+# Function to aggregate transactions into one edge per (sender, receiver) pair.
+# node_attributes maps an attribute name to its (sender column, receiver
+# column); each node takes the value of the row it first appears in.
+
+
+def aggregate_edges(df, sender='Sender Name', receiver='Receiver Name',
+                    amount='Amount', node_attributes=None):
+    codes, labels = encode_nodes(df, sender, receiver)
+
+    nodes = pd.DataFrame({'label': labels})
+    if node_attributes:
+        _, first = np.unique(codes, return_index=True)
+        for name, (sender_column, receiver_column) in node_attributes.items():
+            values = np.column_stack([
+                df[sender_column].to_numpy(dtype=object),
+                df[receiver_column].to_numpy(dtype=object)]).ravel()
+            nodes[name] = values[first]
+
+    edges = pd.DataFrame({
+        'source': codes[0::2],
+        'target': codes[1::2],
+        'amount': df[amount].to_numpy(dtype='float64'),
+    }).groupby(['source', 'target'], sort=False).agg(
+        amount=('amount', 'sum'),
+        count=('amount', 'size'),
+    ).reset_index()
+    edges['sender'] = labels[edges['source'].to_numpy()]
+    edges['receiver'] = labels[edges['target'].to_numpy()]
+
+    return nodes, edges
+
+# Function to build the nodes and edges of aggregate_edges from (sender,
+# receiver) sums aggregated elsewhere, e.g. by the database. With the pairs in
+# the order of their first transaction, nodes and edges come in the same order
+# as aggregate_edges gives them for the rows.
+
+
+def pair_edges(pairs, sender='sender', receiver='receiver'):
+    codes, labels = encode_nodes(pairs, sender, receiver)
+    nodes = pd.DataFrame({'label': labels})
+    edges = pd.DataFrame({
+        'source': codes[0::2],
+        'target': codes[1::2],
+        'amount': pairs['amount'].to_numpy(dtype='float64'),
+        'count': pairs['count'].to_numpy(dtype='int64'),
+    })
+    edges['sender'] = labels[edges['source'].to_numpy()]
+    edges['receiver'] = labels[edges['target'].to_numpy()]
+    return nodes, edges
+
+# Label of the node the pruned nodes are collapsed into
+OTHER_LABEL = 'Other'
+
+# Function to limit an aggregated graph to the top_k nodes ranked by the
+# summed amount or count of their edges. Edges below min_amount are dropped
+# first; the remaining nodes outside the top_k are collapsed into one "Other"
+# node and their edges re-aggregated onto it. Returns the pruned nodes and
+# edges and, for every original node, its new code (-1 when it was dropped).
+
+
+def prune_edges(nodes, edges, top_k=None, by='amount', min_amount=None):
+    if min_amount:
+        edges = edges[edges['amount'] >= min_amount]
+    n_nodes = len(nodes)
+    source = edges['source'].to_numpy()
+    target = edges['target'].to_numpy()
+    present = (np.bincount(source, minlength=n_nodes) +
+               np.bincount(target, minlength=n_nodes)) > 0
+
+    keep = present
+    if top_k is not None and present.sum() > top_k:
+        values = edges[by].to_numpy(dtype='float64')
+        weight = np.bincount(source, values, n_nodes) + np.bincount(target, values, n_nodes)
+        weight[~present] = -np.inf
+        keep = np.zeros(n_nodes, dtype=bool)
+        keep[np.argpartition(-weight, top_k - 1)[:top_k]] = True
+    if keep.all():
+        return nodes, edges, np.arange(n_nodes)
+
+    kept = np.flatnonzero(keep)
+    other = len(kept)
+    collapsed = present & ~keep
+    node_codes = np.full(n_nodes, -1)
+    node_codes[kept] = np.arange(other)
+    node_codes[collapsed] = other
+
+    pruned = pd.DataFrame({
+        'source': node_codes[source],
+        'target': node_codes[target],
+        'amount': edges['amount'].to_numpy(),
+        'count': edges['count'].to_numpy(),
+    })
+    # Flows between two collapsed nodes would only be a loop on "Other"
+    pruned = pruned[(pruned['source'] != other) | (pruned['target'] != other)]
+    pruned = pruned.groupby(['source', 'target'], sort=False).agg(
+        amount=('amount', 'sum'),
+        count=('count', 'sum'),
+    ).reset_index()
+
+    nodes = nodes.iloc[kept].reset_index(drop=True)
+    if collapsed.any():
+        other_node = pd.DataFrame({'label': [f'{OTHER_LABEL} ({collapsed.sum()})']})
+        nodes = pd.concat([nodes, other_node], ignore_index=True)
+    labels = nodes['label'].to_numpy(dtype=object)
+    pruned['sender'] = labels[pruned['source'].to_numpy()]
+    pruned['receiver'] = labels[pruned['target'].to_numpy()]
+    return nodes, pruned, node_codes
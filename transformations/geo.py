@@ -0,0 +1,176 @@
+import numpy as np
+import pandas as pd
+
+# Grid cell sizes in degrees of the map clustering levels. Branches in the
+# same cell are drawn as one marker; None draws every branch on its own.
+CLUSTER_LEVELS = {'Branches': None, 'Fine': 1.0, 'Medium': 4.0, 'Coarse': 10.0}
+DEFAULT_LEVEL = 'Branches'
+# Flows drawn on the branch map, those of the selection or of the whole dataset
+MAP_SCOPES = ('Selection', 'All transactions')
+
+# Function to assign every point to its cell of a grid with the given cell
+# size in degrees. The row and column of a cell are packed into one number.
+
+
+def grid_clusters(lat, lon, size=None):
+    if size is None:
+        return np.arange(len(lat))
+    cells = np.floor(np.asarray(lat) / size) * 1e6 + np.floor(np.asarray(lon) / size)
+    # Branches without coordinates share one cluster
+    return pd.factorize(cells, use_na_sentinel=False)[0]
+
+# Function to parse the "lat, lon" string of each branch into coordinates
+
+
+def _branch_coordinates(labels):
+    coordinates = pd.Series(labels, dtype=object).astype(str).str.split(', ', n=1)
+    return pd.DataFrame({
+        'lat': pd.to_numeric(coordinates.str[0], errors='coerce').to_numpy(dtype='float64'),
+        'lon': pd.to_numeric(coordinates.str[1], errors='coerce').to_numpy(dtype='float64'),
+    }, index=pd.Index(labels, dtype=object, name='branch'))
+
+# Function to count the accounts whose home branch in the account dimension
+# is each branch
+
+
+def _home_accounts(branches, accounts):
+    return accounts['branch'].astype(object).value_counts().reindex(
+        branches.index, fill_value=0).to_numpy(dtype=np.int64)
+
+# Function to assign every branch to its cluster at every level
+
+
+def _with_clusters(branches):
+    for level, size in CLUSTER_LEVELS.items():
+        branches[level] = grid_clusters(branches['lat'], branches['lon'], size)
+    return branches
+
+# Function to build the branch dimension: one row per branch with the
+# coordinates parsed from its "lat, lon" string, the number of people with an
+# account there and its cluster at every level. People are counted from the
+# account dimension when it is given, otherwise from the rows.
+
+
+def build_branches(df, accounts=None):
+    branch = np.concatenate([df['Sender Account Branch'].to_numpy(dtype=object),
+                             df['Receiver Account Branch'].to_numpy(dtype=object)])
+    codes, labels = pd.factorize(branch)
+    branches = _branch_coordinates(labels)
+    if accounts is None:
+        account = np.concatenate([df['Sender Account'].to_numpy(dtype=object),
+                                  df['Receiver Account'].to_numpy(dtype=object)])
+        known = codes >= 0
+        people = pd.DataFrame({'branch': codes[known], 'account': account[known]}).drop_duplicates()
+        branches['people'] = np.bincount(people['branch'].to_numpy(), minlength=len(labels))
+    else:
+        branches['people'] = _home_accounts(branches, accounts)
+    return _with_clusters(branches)
+
+# Function to add the branches of the rows appended at offset to the branch
+# dimension. Loaded branches keep their positions, so flows stay valid, and
+# the people are recounted from the extended account dimension.
+
+
+def extend_branches(branches, df, offset, accounts):
+    delta = df.iloc[offset:]
+    labels = pd.unique(np.concatenate([delta['Sender Account Branch'].to_numpy(dtype=object),
+                                       delta['Receiver Account Branch'].to_numpy(dtype=object)]))
+    labels = labels[pd.notna(labels)]
+    new = labels[~pd.Index(labels).isin(branches.index)]
+    branches = pd.concat([branches[['lat', 'lon']], _branch_coordinates(new)])
+    branches['people'] = _home_accounts(branches, accounts)
+    return _with_clusters(branches)
+
+# Function to aggregate transactions into one flow per (sender branch,
+# receiver branch) pair, with branches as positions in the branch dimension
+
+
+def branch_flows(df, branches):
+    source = branches.index.get_indexer(df['Sender Account Branch'].to_numpy(dtype=object))
+    target = branches.index.get_indexer(df['Receiver Account Branch'].to_numpy(dtype=object))
+    known = (source >= 0) & (target >= 0)
+    return pd.DataFrame({
+        'source': source[known],
+        'target': target[known],
+        'amount': df['Amount'].to_numpy(dtype='float64')[known],
+    }).groupby(['source', 'target'], sort=False).agg(
+        amount=('amount', 'sum'),
+        count=('amount', 'size'),
+    ).reset_index()
+
+# Function to build the branch dimension and the flows of the whole dataset
+# the branch map is served from, and to extend both with appended rows
+
+
+def branch_tables(df, accounts=None):
+    branches = build_branches(df, accounts)
+    return branches, branch_flows(df, branches)
+
+
+def extend_branch_tables(tables, df, offset, accounts):
+    branches, flows = tables
+    branches = extend_branches(branches, df, offset, accounts)
+    flows = pd.concat([flows, branch_flows(df.iloc[offset:], branches)]).groupby(
+        ['source', 'target'], sort=False).agg(
+        amount=('amount', 'sum'),
+        count=('count', 'sum'),
+    ).reset_index()
+    return branches, flows
+
+# Function to turn branch flows into the nodes and edges of one clustering
+# level, in the layout of aggregate_edges so they can be pruned the same way.
+# Each node sits at the mean position of its branches.
+
+
+def cluster_graph(flows, branches, level=DEFAULT_LEVEL):
+    cluster = branches[level].to_numpy()
+    n_clusters = cluster.max() + 1 if len(cluster) else 0
+    members = np.bincount(cluster, minlength=n_clusters)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        lat = np.bincount(cluster, branches['lat'].to_numpy(), n_clusters) / members
+        lon = np.bincount(cluster, branches['lon'].to_numpy(), n_clusters) / members
+    if CLUSTER_LEVELS[level] is None:
+        labels = branches.index.to_numpy(dtype=object)
+    else:
+        labels = np.array([f'{count} branches near {y:.2f}, {x:.2f}'
+                           for count, y, x in zip(members, lat, lon)], dtype=object)
+    nodes = pd.DataFrame({
+        'label': labels,
+        'lat': lat,
+        'lon': lon,
+        'branches': members,
+        'people': np.bincount(cluster, branches['people'].to_numpy(), n_clusters).astype(np.int64),
+    })
+
+    edges = pd.DataFrame({
+        'source': cluster[flows['source'].to_numpy()],
+        'target': cluster[flows['target'].to_numpy()],
+        'amount': flows['amount'].to_numpy(),
+        'count': flows['count'].to_numpy(),
+    }).groupby(['source', 'target'], sort=False).agg(
+        amount=('amount', 'sum'),
+        count=('count', 'sum'),
+    ).reset_index()
+    edges['sender'] = labels[edges['source'].to_numpy()]
+    edges['receiver'] = labels[edges['target'].to_numpy()]
+    return nodes, edges
+
+# Function to list the branches of the selection, by the amount that went
+# through them
+
+
+def involved_branches(df):
+    amounts = pd.concat([
+        pd.Series(df['Amount'].to_numpy(dtype='float64'),
+                  index=df['Sender Account Branch'].to_numpy(dtype=object)),
+        pd.Series(df['Amount'].to_numpy(dtype='float64'),
+                  index=df['Receiver Account Branch'].to_numpy(dtype=object)),
+    ])
+    amounts = amounts.groupby(level=0, sort=False).sum()
+    return amounts.sort_values(ascending=False, kind='stable').index
+
+# Function to return the transactions sent or received at the branch
+
+
+def branch_rows(df, branch):
+    return df[(df['Sender Account Branch'] == branch) | (df['Receiver Account Branch'] == branch)]
@@ -0,0 +1,180 @@
+import hashlib
+import threading
+
+import pandas as pd
+
+from transformations.accounts import build_accounts, extend_accounts
+from transformations.index import build_filter_index, extend_filter_index
+from transformations.ingest import (COLUMNS, delta_lock_path, delta_paths, file_lock,
+                                    load_transactions, normalize_types, read_store,
+                                    share_frame, shared_frame_path, source_version, write_delta)
+from transformations.summary import account_totals, fold_account_totals
+
+# Function to append delta rows to the frame, keeping categorical columns
+# categorical by extending their categories instead of falling back to objects
+
+
+def append_frame(base, delta):
+    if not len(base):
+        return delta.reset_index(drop=True)
+    delta = delta[base.columns].copy()
+    base = base.copy(deep=False)
+    for column in base.columns:
+        if isinstance(base[column].dtype, pd.CategoricalDtype):
+            categories = base[column].cat.categories
+            new = pd.Index(pd.unique(delta[column].astype(object))).difference(categories)
+            if len(new):
+                base[column] = base[column].cat.add_categories(new)
+            delta[column] = pd.Categorical(
+                delta[column].astype(object), categories=base[column].cat.categories)
+    return pd.concat([base, delta], ignore_index=True)
+
+
+class IncrementalDataset:
+    # The loaded frame with its filter index, account dimension and the
+    # account totals of the summary. append() folds a delta batch into all of
+    # them; readers take a consistent snapshot() while appends happen.
+    # Batches are persisted next to the store, so several processes serving
+    # the same source see each other's batches on refresh(), in the same
+    # order. With shared_dir the frame of every version is mapped from there
+    # instead of each process holding its own copy.
+
+    def __init__(self, path, columns=None, shared_dir=None):
+        self.path = path
+        self.columns = columns
+        self.shared_dir = shared_dir
+        self.base_version = source_version(path)
+        self._lock = threading.Lock()
+        # Structures derived from the frame on first use, with the number of
+        # rows they cover
+        self._derived = {}
+        self._derived_lock = threading.Lock()
+
+        frame = load_transactions(path, columns, shared_dir=shared_dir)
+        self._deltas = 0
+        self._state = {
+            'frame': frame,
+            'index': build_filter_index(frame),
+            'accounts': build_accounts(frame),
+            'totals': account_totals(frame),
+            'version': self._version(0),
+        }
+        # Unique IDs, so a delta is checked with one hash lookup per row
+        self._ids = pd.Index(pd.unique(frame['ID'].to_numpy(dtype=object)))
+        self.refresh()
+
+    def _version(self, deltas):
+        if not deltas:
+            return self.base_version
+        digest = hashlib.sha1(f'{self.base_version}:{deltas}'.encode()).hexdigest()
+        return f'{self.base_version[:16]}+{deltas}-{digest[:8]}'
+
+    # Returns the state with delta folded in as the given number of batches,
+    # without publishing it
+    def _extended(self, delta, deltas):
+        state = self._state
+        offset = len(state['frame'])
+        return {
+            'frame': append_frame(state['frame'], delta),
+            'index': extend_filter_index(state['index'], delta, offset),
+            'accounts': extend_accounts(state['accounts'], delta),
+            'totals': fold_account_totals(state['totals'], account_totals(delta)),
+            'version': self._version(deltas),
+        }
+
+    # Publishes a state holding the given number of batches. In shared mode
+    # its frame is replaced by the mapped store of that version, so the copy
+    # append_frame made is dropped.
+    def _publish(self, state, deltas, ids):
+        if self.shared_dir:
+            frame_path = shared_frame_path(self.path, self.base_version,
+                                           [self.columns, True], self.shared_dir, deltas)
+            state['frame'] = share_frame(state['frame'], frame_path)
+        self._deltas = deltas
+        self._ids = self._ids.append(pd.Index(ids))
+        self._state = state
+
+    # Folds in the batches persisted since this dataset last looked, e.g. by
+    # another process, and returns how many were added. Cheap when there are
+    # none: one directory listing.
+    def refresh(self):
+        paths = delta_paths(self.path, self.base_version)
+        if len(paths) <= self._deltas:
+            return 0
+        with self._lock:
+            paths = delta_paths(self.path, self.base_version)[self._deltas:]
+            if not paths:
+                return 0
+            delta = pd.concat([read_store(delta_path, self.columns) for delta_path in paths],
+                              ignore_index=True)
+            self._publish(self._extended(delta, self._deltas + len(paths)),
+                          self._deltas + len(paths), delta['ID'].to_numpy(dtype=object))
+            return len(paths)
+
+    def snapshot(self):
+        return self._state
+
+    @property
+    def version(self):
+        return self._state['version']
+
+    @property
+    def frame(self):
+        return self._state['frame']
+
+    @property
+    def index(self):
+        return self._state['index']
+
+    @property
+    def accounts(self):
+        return self._state['accounts']
+
+    @property
+    def totals(self):
+        return self._state['totals']
+
+    # Returns the structure called name for the frame of the snapshot.
+    # build(frame) makes it from scratch; extend(value, frame, offset) folds in
+    # the rows appended from offset on, so appends never rebuild it.
+    def derived(self, name, snapshot, build, extend):
+        frame = snapshot['frame']
+        with self._derived_lock:
+            value, rows = self._derived.get(name, (None, None))
+            if rows == len(frame):
+                return value
+            if rows is not None and rows > len(frame):
+                # An older snapshot than the one the structure covers
+                return build(frame)
+            value = build(frame) if rows is None else extend(value, frame, rows)
+            self._derived[name] = (value, len(frame))
+            return value
+
+    # Appends the rows of delta whose ID is not loaded yet and returns how many
+    # were added. The new state is built before the delta is persisted next to
+    # the store, so a batch that cannot be loaded is never replayed on restart.
+    # Appends of all processes are serialized by a lock file, and each first
+    # folds in the batches persisted before it, so every process applies the
+    # batches in the same order.
+    def append(self, delta):
+        required = ['ID'] + [column for column in self.columns or COLUMNS if column != 'ID']
+        missing = [column for column in required if column not in delta.columns]
+        if missing:
+            raise ValueError(f'Delta batch is missing the columns {missing}')
+        delta = normalize_types(delta)
+        with file_lock(delta_lock_path(self.path, self.base_version)):
+            self.refresh()
+            with self._lock:
+                unseen = self._ids.get_indexer(delta['ID'].to_numpy(dtype=object)) < 0
+                delta = delta[unseen].drop_duplicates('ID')
+                if not len(delta):
+                    return 0
+                stored = delta
+                if self.columns is not None:
+                    delta = delta[self.columns]
+
+                deltas = self._deltas + 1
+                state = self._extended(delta, deltas)
+                write_delta(self.path, self.base_version, stored)
+                self._publish(state, deltas, delta['ID'].to_numpy(dtype=object))
+                return len(delta)
@@ -0,0 +1,85 @@
+import numpy as np
+
+# Sidebar filter fields and the sender/receiver columns they match on
+FILTER_FIELDS = {
+    'name': ('Sender Name', 'Receiver Name'),
+    'phone': ('Sender Phone Number', 'Receiver Phone Number'),
+    'account': ('Sender Account', 'Receiver Account'),
+}
+
+EMPTY_POSITIONS = np.empty(0, dtype=np.int64)
+
+# Function to map every value of the given columns to the row positions it
+# appears at on either side
+
+
+def _value_positions(df, columns):
+    positions = {}
+    for column in columns:
+        for value, rows in df.groupby(column, sort=False, observed=True).indices.items():
+            positions.setdefault(value, []).append(rows)
+    return {
+        value: np.unique(np.concatenate(rows)) if len(rows) > 1 else rows[0].astype(np.int64)
+        for value, rows in positions.items()
+    }
+
+# Function to build the inverted index used by the sidebar filters
+
+
+def build_filter_index(df):
+    index = {}
+    for field, columns in FILTER_FIELDS.items():
+        positions = _value_positions(df, columns)
+        index[field] = {
+            'options': sorted(positions),
+            'positions': positions,
+        }
+    return index
+
+# Function to return a new index that also covers the delta rows, which start
+# at row position offset. Only the values present in the delta are rebuilt;
+# the index passed in is left unchanged for readers still using it.
+
+
+def extend_filter_index(index, delta, offset):
+    extended = {}
+    for field, columns in FILTER_FIELDS.items():
+        positions = dict(index[field]['positions'])
+        options = index[field]['options']
+        new_values = []
+        for value, rows in _value_positions(delta, columns).items():
+            rows = rows + offset
+            if value in positions:
+                positions[value] = np.concatenate([positions[value], rows])
+            else:
+                positions[value] = rows
+                new_values.append(value)
+        if new_values:
+            options = sorted(options + new_values)
+        extended[field] = {
+            'options': options,
+            'positions': positions,
+        }
+    return extended
+
+
+def filter_options(index, field):
+    return index[field]['options']
+
+# Function to return the sorted, de-duplicated row positions matching any of
+# the selected values
+
+
+def filter_positions(index, selections):
+    matches = []
+    for field, values in selections.items():
+        positions = index[field]['positions']
+        matches.extend(positions[value]
+                       for value in values if value in positions)
+    if not matches:
+        return EMPTY_POSITIONS
+    return np.unique(np.concatenate(matches))
+
+
+def apply_filters(df, index, selections):
+    return df.take(filter_positions(index, selections))
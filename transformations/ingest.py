@@ -0,0 +1,444 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+CACHE_DIR = os.path.join('data', '.cache')
+STORE_VERSION = 2
+# Rows per chunk when a source is read incrementally
+CHUNK_ROWS = 100_000
+SOURCE_FORMATS = ('.xlsx', '.csv', '.parquet', '.arrow')
+
+# Columns of the transaction export with their columnar types
+STRING_COLUMNS = [
+    'ID', 'Sender Account', 'Sender Account Branch', 'Sender Account Type',
+    'Sender Name', 'Receiver Account', 'Receiver Account Branch',
+    'Receiver Account Type', 'Receiver Name', 'Currency',
+    'Sender Phone Number', 'Receiver Phone Number',
+    'Purpose of Transaction', 'Transaction Type'
+]
+FLOAT_COLUMNS = [
+    'Sender Current Account Balance', 'Receiver Current Account Balance', 'Amount'
+]
+DATE_COLUMNS = ['Date and Time']
+COLUMNS = STRING_COLUMNS + FLOAT_COLUMNS + DATE_COLUMNS
+# Low-cardinality columns held as categoricals in memory, IDs stay plain strings
+CATEGORY_COLUMNS = [column for column in STRING_COLUMNS if column != 'ID']
+
+# Function to hash the contents of the source file
+
+
+def file_hash(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _store_paths(path, cache_dir):
+    name = os.path.basename(path)
+    store_path = os.path.join(cache_dir, f'{name}.arrow')
+    meta_path = os.path.join(cache_dir, f'{name}.json')
+    return store_path, meta_path
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+# Function to name the temporary file of a write, unique per process and
+# thread so workers starting cold together never write the same file
+
+
+def _tmp_path(path):
+    return f'{path}.{os.getpid()}-{threading.get_ident()}.tmp'
+
+
+def _write_meta(meta_path, meta):
+    tmp_path = _tmp_path(meta_path)
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(meta, file)
+    os.replace(tmp_path, meta_path)
+
+# Function to hold an exclusive lock on lock_path across the processes of the
+# host, e.g. the workers of a deployment sharing one cache directory
+
+
+@contextmanager
+def file_lock(lock_path):
+    os.makedirs(os.path.dirname(lock_path) or '.', exist_ok=True)
+    with open(lock_path, 'a+b') as file:
+        if os.name == 'nt':
+            import msvcrt
+
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+# Function to return the version of the source file, hashing it only when its
+# mtime or size changed since the store was written
+
+
+def source_version(path, cache_dir=CACHE_DIR):
+    stat = os.stat(path)
+    _, meta_path = _store_paths(path, cache_dir)
+    meta = _read_meta(meta_path)
+    if meta and meta.get('mtime_ns') == stat.st_mtime_ns and meta.get('size') == stat.st_size:
+        return meta['sha256']
+    return file_hash(path)
+
+
+def source_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in SOURCE_FORMATS:
+        raise ValueError(
+            f'Unsupported source format {extension!r}, expected one of {SOURCE_FORMATS}')
+    return extension
+
+
+def _iter_excel_chunks(path, columns, chunk_rows):
+    from openpyxl import load_workbook
+
+    # Read-only mode streams rows instead of loading the whole sheet
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = list(next(rows, ()))
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= chunk_rows:
+                yield pd.DataFrame(batch, columns=header)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=header)
+    finally:
+        workbook.close()
+
+
+def _iter_store_chunks(path, columns, chunk_rows):
+    # Record batches are sliced out of the memory-mapped store
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            if columns is not None:
+                batch = batch.select(columns)
+            for offset in range(0, batch.num_rows, chunk_rows):
+                yield batch.slice(offset, chunk_rows).to_pandas()
+
+# Function to read the source in typed chunks of at most chunk_rows rows
+
+
+def iter_chunks(path, columns=None, chunk_rows=CHUNK_ROWS):
+    extension = source_format(path)
+    if extension == '.csv':
+        chunks = pd.read_csv(path, usecols=columns, chunksize=chunk_rows)
+    elif extension == '.parquet':
+        batches = pq.ParquetFile(path).iter_batches(
+            batch_size=chunk_rows, columns=columns)
+        chunks = (batch.to_pandas() for batch in batches)
+    elif extension == '.arrow':
+        chunks = _iter_store_chunks(path, columns, chunk_rows)
+    else:
+        chunks = _iter_excel_chunks(path, columns, chunk_rows)
+
+    for chunk in chunks:
+        if columns is not None:
+            chunk = chunk[columns]
+        yield normalize_types(chunk)
+
+
+def empty_frame(columns=None):
+    return normalize_types(pd.DataFrame(columns=columns or COLUMNS))
+
+
+def normalize_types(df):
+    df = df.copy()
+    for column in STRING_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype(str)
+    for column in FLOAT_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_numeric(
+                df[column], errors='coerce').astype('float64')
+    for column in DATE_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column])
+    return df
+
+# Function to convert the source into an Arrow IPC store on disk
+
+
+def build_store(path, cache_dir=CACHE_DIR, version=None):
+    os.makedirs(cache_dir, exist_ok=True)
+    store_path, meta_path = _store_paths(path, cache_dir)
+    stat = os.stat(path)
+    version = version or file_hash(path)
+
+    # Chunks are appended as record batches so the source never has to fit in
+    # memory. Uncompressed so the file can be memory-mapped without decoding.
+    tmp_path = _tmp_path(store_path)
+    schema = None
+    writer = None
+    try:
+        for chunk in iter_chunks(path):
+            batch = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                schema = batch.schema.remove_metadata()
+                writer = pa.ipc.new_file(tmp_path, schema)
+            writer.write_table(batch.cast(schema))
+        if writer is None:
+            schema = pa.schema([])
+            writer = pa.ipc.new_file(tmp_path, schema)
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(tmp_path, store_path)
+
+    _write_meta(meta_path, {
+        'store_version': STORE_VERSION,
+        'source': os.path.abspath(path),
+        'sha256': version,
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'columns': schema.names,
+    })
+    return store_path
+
+# Function to return the store for the source, rebuilding it only when the
+# source contents changed
+
+
+def ensure_store(path, cache_dir=CACHE_DIR):
+    store_path, meta_path = _store_paths(path, cache_dir)
+    version = source_version(path, cache_dir)
+    meta = _read_meta(meta_path)
+    if (meta and os.path.exists(store_path)
+            and meta.get('store_version') == STORE_VERSION
+            and meta.get('sha256') == version):
+        stat = os.stat(path)
+        if meta.get('mtime_ns') != stat.st_mtime_ns:
+            # Source was touched but not changed, refresh the stat key only
+            meta.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+            _write_meta(meta_path, meta)
+        return store_path, version
+    return build_store(path, cache_dir, version), version
+
+# Function to read a delta batch from an uploaded file or buffer
+
+
+def read_delta(buffer, name):
+    extension = source_format(name)
+    if extension == '.csv':
+        df = pd.read_csv(buffer)
+    elif extension == '.parquet':
+        df = pd.read_parquet(buffer)
+    elif extension == '.xlsx':
+        df = pd.read_excel(buffer)
+    else:
+        raise ValueError(f'Cannot append from {extension!r} files')
+    return normalize_types(df)
+
+# Appended delta batches are kept next to the store, under the version of the
+# source they extend, so they are dropped when the source itself changes
+
+
+def delta_dir(path, version, cache_dir=CACHE_DIR):
+    store_path, _ = _store_paths(path, cache_dir)
+    return os.path.join(f'{store_path}.deltas', version[:16])
+
+
+def delta_lock_path(path, version, cache_dir=CACHE_DIR):
+    return os.path.join(delta_dir(path, version, cache_dir), '.lock')
+
+# Function to persist a delta batch under the next sequence number. The
+# number is claimed with a hard link, which fails when another process took
+# it first, so concurrent appends never overwrite each other.
+
+
+def write_delta(path, version, delta, cache_dir=CACHE_DIR):
+    directory = delta_dir(path, version, cache_dir)
+    os.makedirs(directory, exist_ok=True)
+    table = pa.Table.from_pandas(normalize_types(delta), preserve_index=False)
+    tmp_path = _tmp_path(os.path.join(directory, 'delta'))
+    feather.write_feather(table, tmp_path, compression='uncompressed')
+    sequence = len(delta_paths(path, version, cache_dir))
+    while True:
+        delta_path = os.path.join(directory, f'{sequence:06d}.arrow')
+        try:
+            os.link(tmp_path, delta_path)
+            break
+        except FileExistsError:
+            sequence += 1
+    os.remove(tmp_path)
+    return delta_path
+
+
+def delta_paths(path, version, cache_dir=CACHE_DIR):
+    directory = delta_dir(path, version, cache_dir)
+    if not os.path.isdir(directory):
+        return []
+    return [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+            if name.endswith('.arrow')]
+
+# Function to memory-map the store and load the requested columns. With
+# compact set, string columns are dictionary-encoded before conversion so they
+# arrive as categoricals without materializing a Python string per row.
+
+
+def read_store(store_path, columns=None, compact=True):
+    table = feather.read_table(store_path, columns=columns, memory_map=True)
+    if compact:
+        for i, name in enumerate(table.column_names):
+            if name in CATEGORY_COLUMNS and not pa.types.is_dictionary(table.schema.field(i).type):
+                table = table.set_column(
+                    i, name, table.column(i).dictionary_encode())
+    df = table.to_pandas()
+    return compact_numbers(df) if compact else df
+
+# Function to store whole-valued amounts and balances as integers. Fractional
+# columns stay float64 so sums keep their precision.
+
+
+def compact_numbers(df):
+    for column in FLOAT_COLUMNS:
+        if column not in df.columns or not len(df):
+            continue
+        values = df[column]
+        if values.isna().any() or (values % 1 != 0).any():
+            continue
+        if values.min() >= np.iinfo(np.int32).min and values.max() <= np.iinfo(np.int32).max:
+            df[column] = values.astype(np.int32)
+        else:
+            df[column] = values.astype(np.int64)
+    return df
+
+# Function to report the in-memory size of the frame against the size the same
+# columns would take as plain object strings
+
+
+def memory_report(df):
+    actual = int(df.memory_usage(index=True, deep=True).sum())
+    as_objects = actual
+    for column in df.columns:
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            counts = np.bincount(values.cat.codes.to_numpy() + 1,
+                                 minlength=len(values.cat.categories) + 1)[1:]
+            sizes = np.array([sys.getsizeof(category)
+                             for category in values.cat.categories], dtype=np.int64)
+            object_bytes = int((counts * sizes).sum()) + 8 * len(values)
+            as_objects += object_bytes - int(values.memory_usage(index=False, deep=True))
+        elif values.dtype in (np.int32, np.float32):
+            as_objects += 4 * len(values)
+    return {
+        'rows': len(df),
+        'bytes': actual,
+        'object_bytes': as_objects,
+        'saved_bytes': as_objects - actual,
+    }
+
+
+# Function to write the loaded frame, with its final dtypes, as one
+# uncompressed record batch so every column maps straight onto the file
+
+
+def write_frame_store(df, frame_path):
+    table = pa.Table.from_pandas(df, preserve_index=False).combine_chunks()
+    tmp_path = _tmp_path(frame_path)
+    feather.write_feather(table, tmp_path, compression='uncompressed',
+                          chunksize=max(1, len(df)))
+    os.replace(tmp_path, frame_path)
+
+# Function to map a frame store. Numeric and date columns and category codes
+# are read-only views over the mapped pages, which the OS shares between all
+# processes mapping the file; only category values and IDs become per-process
+# Python objects.
+
+
+def read_frame_store(frame_path):
+    table = feather.read_table(frame_path, memory_map=True)
+    return table.to_pandas(split_blocks=True)
+
+# Function to return the path of the frame store of a source version in the
+# shared directory, with the given number of appended batches, removing the
+# stores of older versions. Of the current version, the store without batches
+# stays for processes starting cold; stores with fewer batches are dropped.
+
+
+def shared_frame_path(path, version, columns, shared_dir, deltas=0):
+    name = os.path.basename(path)
+    key = hashlib.sha1(json.dumps(columns).encode()).hexdigest()[:8]
+    prefix = f'{name}-{version[:16]}-{key}'
+    frame_path = os.path.join(shared_dir, f'{prefix}+{deltas}.arrow' if deltas else f'{prefix}.arrow')
+    for entry in os.listdir(shared_dir):
+        if not (entry.startswith(f'{name}-') and entry.endswith('.arrow')):
+            continue
+        if entry.startswith(f'{name}-{version[:16]}-'):
+            stale = (entry.startswith(f'{prefix}+')
+                     and int(entry[len(prefix) + 1:-len('.arrow')]) < deltas)
+        else:
+            stale = True
+        if stale:
+            # Processes still mapping an old store keep their mapping
+            try:
+                os.remove(os.path.join(shared_dir, entry))
+            except OSError:
+                pass
+    return frame_path
+
+# Function to map the frame store of a version from the shared directory,
+# writing it from frame first when no process has yet
+
+
+def share_frame(frame, frame_path):
+    for _ in range(2):
+        if not os.path.exists(frame_path):
+            write_frame_store(frame, frame_path)
+        try:
+            return read_frame_store(frame_path)
+        except FileNotFoundError:
+            # Removed by a process that moved on to a newer version meanwhile
+            continue
+    return frame
+
+# Function to load the transaction frame. With shared_dir (e.g. /dev/shm) the
+# compact frame is written there once and mapped by every process on the
+# host instead of each process holding its own copy.
+
+
+def load_transactions(path, columns=None, cache_dir=CACHE_DIR, compact=True, shared_dir=None):
+    store_path, version = ensure_store(path, cache_dir)
+    if not shared_dir:
+        return read_store(store_path, columns, compact)
+
+    os.makedirs(shared_dir, exist_ok=True)
+    frame_path = shared_frame_path(path, version, [columns, compact], shared_dir)
+    if not os.path.exists(frame_path):
+        write_frame_store(read_store(store_path, columns, compact), frame_path)
+    return read_frame_store(frame_path)
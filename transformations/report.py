@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+from transformations.edges import aggregate_edges
+from transformations.adjacency import expand_selection
+from transformations.index import filter_positions
+from transformations.timeindex import restrict_to_window
+from transformations.summary import account_summary, involved_accounts, totals_summary
+
+# Streamlit-free core used by both the dashboard and the batch reports. Each
+# function takes the loaded frame and its filter index, so a caller loads the
+# dataset once and runs any number of selections against it.
+EDGE_COLUMNS = ['sender', 'receiver', 'amount', 'count']
+
+# Function to compute the metric boxes of the selected rows: the number of
+# transactions, their total amount and the number of distinct accounts
+
+
+def selection_metrics(rows):
+    accounts = np.concatenate([rows['Sender Account'].to_numpy(dtype=object),
+                               rows['Receiver Account'].to_numpy(dtype=object)])
+    return {
+        'transactions': len(rows),
+        'amount': float(rows['Amount'].sum()),
+        'accounts': len(pd.unique(accounts)),
+    }
+
+# Function to return the rows matching any selected value, with their totals,
+# counts and number of involved accounts. Given an adjacency index, expansion
+# holds the hops, direction and time_ordered arguments of expand_selection;
+# given a time index, the rows are limited to the (start, end) window.
+
+
+def select(frame, index, selections, adjacency=None, time_index=None, window=None,
+           **expansion):
+    positions = filter_positions(index, selections)
+    if adjacency is not None and expansion.get('hops', 1) > 1:
+        positions = expand_selection(adjacency, positions, **expansion)
+    if time_index is not None and window is not None:
+        positions = restrict_to_window(time_index, positions, *window)
+    rows = frame.take(positions)
+    return rows, selection_metrics(rows)
+
+# Function to compute the tables of one selection: the metric boxes, the
+# summary of every involved account and the (sender, receiver) edge sums.
+# accounts is the account dimension of the frame; given the account_totals of
+# the frame too, the summary is looked up in them instead of the rows.
+
+
+def selection_report(frame, index, selections, adjacency=None, accounts=None,
+                     time_index=None, window=None, totals=None, **expansion):
+    rows, metrics = select(frame, index, selections, adjacency, time_index, window,
+                           **expansion)
+    _, edges = aggregate_edges(rows)
+    if totals is not None and accounts is not None:
+        summary = totals_summary(totals, involved_accounts(rows), accounts)
+    else:
+        summary = account_summary(frame, involved_accounts(rows), accounts)
+    return {
+        'rows': rows,
+        'metrics': metrics,
+        'summary': summary,
+        'edges': edges[EDGE_COLUMNS],
+    }
+
+# Function to build the static figures of a selection, plotly figures for the
+# cash flow and map and the ego graph as standalone HTML. pruning holds the
+# top_k, by and min_amount arguments of prune_edges. The graph libraries are
+# imported here so selections and tables don't load them.
+
+
+def selection_figures(rows, accounts=None, cache_key=None, **pruning):
+    from graphs.ego import ego_html
+    from graphs.map import generate_map
+    from graphs.sankey import generate_sankey
+
+    return {
+        'sankey': generate_sankey(rows, cache_key=cache_key, **pruning),
+        'map': generate_map(rows, accounts=accounts, cache_key=cache_key, **pruning),
+        'ego': ego_html(rows, cache_key=cache_key, **pruning),
+    }
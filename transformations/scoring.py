@@ -0,0 +1,168 @@
+import numpy as np
+import pandas as pd
+
+# Thresholds at which each signal flags a transaction
+VELOCITY_WINDOW = pd.Timedelta(days=1)
+BURST_COUNT = 5
+Z_THRESHOLD = 3.0
+ROUND_TRIP_WINDOW = pd.Timedelta(days=7)
+# Accounts with fewer sent transactions have no amount z-score
+MIN_HISTORY = 3
+
+SCORE_COLUMNS = ['Velocity', 'Velocity Amount', 'Amount Z-Score', 'Round Trip', 'Score']
+
+# Function to sort the rows by group and time and return, in that order, the
+# positions, a (group, time rank) key that increases along it, and the ranks
+# of all times. Time ranges within a group are then found with one
+# searchsorted over the whole frame.
+
+
+def _group_time_keys(codes, times):
+    order = np.lexsort((times, codes))
+    sorted_times = np.sort(times)
+    rank = np.searchsorted(sorted_times, times[order])
+    keys = codes[order].astype(np.int64) * len(times) + rank
+    return order, keys, sorted_times
+
+# Function to count the transfers each sender made in the window ending at each
+# transaction, and their total amount
+
+
+def velocity(df, window=VELOCITY_WINDOW):
+    codes = pd.factorize(df['Sender Account'].to_numpy(dtype=object))[0]
+    times = df['Date and Time'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    order, keys, sorted_times = _group_time_keys(codes, times)
+
+    lower = codes[order].astype(np.int64) * len(times) + np.searchsorted(
+        sorted_times, times[order] - window.value)
+    first = np.searchsorted(keys, lower)
+    # Rows with the same key as the current one up to and including it
+    last = np.searchsorted(keys, keys, 'right')
+    amounts = np.concatenate([[0.0], np.cumsum(df['Amount'].to_numpy(dtype='float64')[order])])
+
+    count = np.empty(len(df), dtype=np.int64)
+    total = np.empty(len(df), dtype='float64')
+    count[order] = last - first
+    total[order] = amounts[last] - amounts[first]
+    return count, total
+
+# Function to compute the z-score of each amount against the sender's history
+
+
+def amount_zscores(df):
+    amounts = df['Amount'].astype('float64')
+    grouped = amounts.groupby(df['Sender Account'], observed=True, sort=False)
+    mean = grouped.transform('mean')
+    std = grouped.transform('std')
+    size = grouped.transform('size')
+    z = (amounts - mean) / std.where(std > 0)
+    return z.where(size >= MIN_HISTORY).to_numpy()
+
+# Function to flag transfers A->B followed by a transfer B->A within the window
+
+
+def round_trips(df, window=ROUND_TRIP_WINDOW):
+    n_rows = len(df)
+    accounts = pd.factorize(np.concatenate([
+        df['Sender Account'].to_numpy(dtype=object),
+        df['Receiver Account'].to_numpy(dtype=object)]))[0].astype(np.int64)
+    sender, receiver = accounts[:n_rows], accounts[n_rows:]
+    # Each (sender, receiver) pair as one integer, and its reverse pair
+    n_accounts = accounts.max() + 1
+    codes, uniques = pd.factorize(sender * n_accounts + receiver)
+    reverse = pd.Index(uniques).get_indexer(receiver * n_accounts + sender)
+
+    times = df['Date and Time'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    _, keys, sorted_times = _group_time_keys(codes, times)
+    base = reverse.astype(np.int64) * len(times)
+    # Reverse transfers at or after this one and no later than the window
+    first = np.searchsorted(keys, base + np.searchsorted(sorted_times, times))
+    last = np.searchsorted(keys, base + np.searchsorted(sorted_times, times + window.value, 'right'))
+    return (reverse >= 0) & (last > first) & (sender != receiver)
+
+# Function to score every transaction. Each signal contributes about 1 at its
+# threshold, so the score ranks transactions by how many signals they raise
+# and how strongly.
+
+
+def score_transactions(df, velocity_window=VELOCITY_WINDOW, round_trip_window=ROUND_TRIP_WINDOW):
+    if not len(df):
+        return pd.DataFrame({column: np.array([], dtype=dtype) for column, dtype in zip(
+            SCORE_COLUMNS, ['int64', 'float64', 'float64', 'bool', 'float64'])}, index=df.index)
+    count, total = velocity(df, velocity_window)
+    z = amount_zscores(df)
+    round_trip = round_trips(df, round_trip_window)
+    score = (np.nan_to_num(np.abs(z)) / Z_THRESHOLD + count / BURST_COUNT +
+             round_trip.astype('float64'))
+    return pd.DataFrame({
+        'Velocity': count,
+        'Velocity Amount': total,
+        'Amount Z-Score': z,
+        'Round Trip': round_trip,
+        'Score': score,
+    }, index=df.index)
+
+# Function to fold the rows appended at offset into the scores of df[:offset].
+# Only the rows sent by an account in the new rows can change: their velocity
+# and z-score depend on the sender's rows, and a round trip on the rows sent
+# back to the sender. These are rescored from every row touching those
+# accounts, which holds all the history they depend on.
+
+
+def extend_scores(scores, df, offset, velocity_window=VELOCITY_WINDOW,
+                  round_trip_window=ROUND_TRIP_WINDOW):
+    delta = df.iloc[offset:]
+    touched = pd.unique(np.concatenate([delta['Sender Account'].to_numpy(dtype=object),
+                                        delta['Receiver Account'].to_numpy(dtype=object)]))
+    sender = df['Sender Account'].isin(touched).to_numpy()
+    related = np.flatnonzero(sender | df['Receiver Account'].isin(touched).to_numpy())
+    rescored = score_transactions(df.iloc[related], velocity_window, round_trip_window)
+    changed = sender[related]
+
+    columns = {}
+    for column in SCORE_COLUMNS:
+        values = np.concatenate([scores[column].to_numpy(),
+                                 np.zeros(len(delta), dtype=scores[column].dtype)])
+        values[related[changed]] = rescored[column].to_numpy()[changed]
+        columns[column] = values
+    return pd.DataFrame(columns, index=df.index)
+
+# Function to return which signals each scored row raises as a string mask
+
+
+def flag_labels(scores):
+    labels = pd.Series('', index=scores.index, dtype=object)
+    labels = labels.mask(scores['Velocity'] >= BURST_COUNT, labels + 'burst ')
+    labels = labels.mask(scores['Amount Z-Score'].abs() >= Z_THRESHOLD, labels + 'unusual amount ')
+    labels = labels.mask(scores['Round Trip'], labels + 'round trip ')
+    return labels.str.strip()
+
+# Function to return the flagged rows of the selection ranked by score, with
+# the signals they raise
+
+
+def flagged_transactions(rows, scores):
+    scores = scores.reindex(rows.index)
+    flags = flag_labels(scores)
+    flagged = flags != ''
+    ranked = pd.concat([
+        rows.loc[flagged, ['ID', 'Sender Account', 'Sender Name', 'Receiver Account',
+                           'Receiver Name', 'Amount', 'Date and Time']],
+        scores.loc[flagged],
+        flags[flagged].rename('Flags'),
+    ], axis=1)
+    return ranked.sort_values('Score', ascending=False, kind='stable')
+
+# Function to mark the aggregated edges whose (sender, receiver) names have a
+# flagged transaction
+
+
+def flag_edges(edges, flagged):
+    if flagged is None or not len(flagged):
+        return np.zeros(len(edges), dtype=bool)
+    pairs = pd.MultiIndex.from_arrays([
+        flagged['Sender Name'].to_numpy(dtype=object),
+        flagged['Receiver Name'].to_numpy(dtype=object)])
+    return pd.MultiIndex.from_arrays([
+        edges['sender'].to_numpy(dtype=object),
+        edges['receiver'].to_numpy(dtype=object)]).isin(pairs)
@@ -0,0 +1,178 @@
+import os
+import sqlite3
+import threading
+from contextlib import closing
+
+import pandas as pd
+
+from transformations.edges import pair_edges
+from transformations.index import FILTER_FIELDS
+from transformations.ingest import CACHE_DIR, ensure_store, iter_chunks, normalize_types
+from transformations.summary import assemble_summary
+
+# Embedded SQLite backend: the transactions are loaded once per source version
+# into a database file with indexes on the filter columns, and filters, metric
+# boxes, pie counts, edge sums and account summaries run as SQL returning
+# small results.
+# SQLite ships with Python, so no extra dependency is needed.
+TABLE = 'transactions'
+INDEXED_COLUMNS = [column for pair in FILTER_FIELDS.values() for column in pair]
+
+
+def _quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+def database_path(path, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, f'{os.path.basename(path)}.sqlite')
+
+# Function to load the source into the database, unless it already holds this
+# version of the source. The rows are loaded from the Arrow store, whose
+# metadata keeps the mtime and size of the source, so the source is only hashed
+# again when it changed. Returns the database path and the source version.
+
+
+def build_database(path, db_path=None, cache_dir=CACHE_DIR):
+    db_path = db_path or database_path(path, cache_dir)
+    store_path, version = ensure_store(path, cache_dir)
+    os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+
+    if os.path.exists(db_path):
+        with closing(sqlite3.connect(db_path)) as connection:
+            try:
+                stored = connection.execute(
+                    'SELECT version FROM meta').fetchone()
+            except sqlite3.DatabaseError:
+                stored = None
+        if stored and stored[0] == version:
+            return db_path, version
+
+    # Named per process so workers starting cold together never share it
+    tmp_path = f'{db_path}.{os.getpid()}-{threading.get_ident()}.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    with closing(sqlite3.connect(tmp_path)) as connection:
+        for chunk in iter_chunks(store_path):
+            chunk = chunk.assign(**{'Date and Time': chunk['Date and Time'].astype(str)})
+            chunk.to_sql(TABLE, connection, if_exists='append', index=False)
+        for i, column in enumerate(INDEXED_COLUMNS):
+            connection.execute(
+                f'CREATE INDEX idx_{i} ON {TABLE} ({_quote(column)})')
+        connection.execute('CREATE TABLE meta (version TEXT)')
+        connection.execute('INSERT INTO meta VALUES (?)', (version,))
+        connection.commit()
+    os.replace(tmp_path, db_path)
+    return db_path, version
+
+
+class SqlBackend:
+    # Each call opens its own read-only connection so the backend can be shared
+    # between sessions and threads
+
+    def __init__(self, path, db_path=None):
+        self.path = path
+        self.db_path, self.version = build_database(path, db_path)
+
+    def _connect(self):
+        connection = sqlite3.connect(f'file:{self.db_path}?mode=ro', uri=True)
+        connection.execute('CREATE TEMP TABLE selected (field TEXT, value TEXT)')
+        return connection
+
+    def _select(self, connection, selections):
+        connection.executemany(
+            'INSERT INTO selected VALUES (?, ?)',
+            [(field, str(value)) for field, values in selections.items() for value in values])
+        # One indexed lookup per column, UNION removes rows matched twice
+        lookups = [
+            f"SELECT rowid AS id FROM {TABLE} WHERE {_quote(column)} IN "
+            f"(SELECT value FROM selected WHERE field = '{field}')"
+            for field, columns in FILTER_FIELDS.items() if selections.get(field)
+            for column in columns
+        ]
+        if not lookups:
+            lookups = ['SELECT NULL AS id WHERE 0']
+        connection.execute(
+            'CREATE TEMP TABLE matched AS ' + ' UNION '.join(lookups))
+
+    def options(self, field):
+        sender, receiver = FILTER_FIELDS[field]
+        with closing(sqlite3.connect(f'file:{self.db_path}?mode=ro', uri=True)) as connection:
+            rows = connection.execute(
+                f'SELECT {_quote(sender)} FROM {TABLE} UNION '
+                f'SELECT {_quote(receiver)} FROM {TABLE} ORDER BY 1').fetchall()
+        return [row[0] for row in rows]
+
+    def filter(self, selections, columns=None):
+        projection = ', '.join(f't.{_quote(column)}' for column in columns) if columns else 't.*'
+        with closing(self._connect()) as connection:
+            self._select(connection, selections)
+            df = pd.read_sql_query(
+                f'SELECT {projection} FROM {TABLE} t JOIN matched m ON t.rowid = m.id '
+                f'ORDER BY t.rowid', connection)
+        return normalize_types(df)
+
+    def metrics(self, selections):
+        with closing(self._connect()) as connection:
+            self._select(connection, selections)
+            transactions, amount = connection.execute(
+                f'SELECT COUNT(*), COALESCE(SUM(t."Amount"), 0) FROM {TABLE} t '
+                f'JOIN matched m ON t.rowid = m.id').fetchone()
+            accounts, = connection.execute(
+                f'SELECT COUNT(*) FROM ('
+                f'SELECT t."Sender Account" FROM {TABLE} t JOIN matched m ON t.rowid = m.id '
+                f'UNION SELECT t."Receiver Account" FROM {TABLE} t JOIN matched m ON t.rowid = m.id)'
+            ).fetchone()
+        return {'transactions': transactions, 'amount': float(amount), 'accounts': accounts}
+
+    # Same nodes and edges as edges.aggregate_edges over the matched rows. Pairs
+    # are summed by the database and ordered by their first row, which keeps
+    # the node order of the in-memory backend.
+    def edges(self, selections):
+        with closing(self._connect()) as connection:
+            self._select(connection, selections)
+            pairs = pd.read_sql_query(
+                f'SELECT t."Sender Name" AS sender, t."Receiver Name" AS receiver, '
+                f'SUM(t."Amount") AS amount, COUNT(*) AS count, MIN(t.rowid) AS first '
+                f'FROM {TABLE} t JOIN matched m ON t.rowid = m.id '
+                f'GROUP BY 1, 2 ORDER BY first', connection)
+        return pair_edges(pairs)
+
+    # Matched rows per value of column, for the pie charts
+    def value_counts(self, selections, column):
+        with closing(self._connect()) as connection:
+            self._select(connection, selections)
+            counts = pd.read_sql_query(
+                f'SELECT t.{_quote(column)} AS value, COUNT(*) AS count '
+                f'FROM {TABLE} t JOIN matched m ON t.rowid = m.id GROUP BY 1',
+                connection, index_col='value')['count']
+        return counts.astype('int64').rename_axis(column)
+
+    # Same result as summary.account_summary over the full dataset. Name and
+    # type are taken from the first row of each account, using SQLite's
+    # bare-column semantics with MIN(rowid).
+    def account_summary(self, accounts):
+        accounts = [str(account) for account in pd.unique(pd.Series(accounts, dtype=object))]
+        with closing(self._connect()) as connection:
+            connection.executemany('INSERT INTO selected VALUES (?, ?)',
+                                   [('account', account) for account in accounts])
+            selected = "(SELECT value FROM selected WHERE field = 'account')"
+            sides = {}
+            for side, other in (('Sender', 'Receiver'), ('Receiver', 'Sender')):
+                stats = pd.read_sql_query(
+                    f'SELECT "{side} Account" AS account, SUM("Amount") AS total, '
+                    f'COUNT(*) AS count, "{side} Name" AS name, '
+                    f'"{side} Account Type" AS type, MIN(rowid) '
+                    f'FROM {TABLE} WHERE "{side} Account" IN {selected} GROUP BY 1',
+                    connection, index_col='account')
+                # No rows on this side come back as untyped columns
+                stats = stats.astype({'total': 'float64', 'count': 'int64'})
+                branches = pd.read_sql_query(
+                    f'SELECT "{side} Account" AS account, "{other} Account Branch" AS branch, '
+                    f'SUM("Amount") AS amount FROM {TABLE} '
+                    f'WHERE "{side} Account" IN {selected} GROUP BY 1, 2 ORDER BY 1, 2',
+                    connection, index_col=['account', 'branch'])['amount']
+                sides[side] = (stats, branches)
+        (sent, branches_sent), (received, branches_received) = sides['Sender'], sides['Receiver']
+        attributes = sent[['name', 'type']].combine_first(received[['name', 'type']])
+        return assemble_summary(accounts, sent[['total', 'count']], received[['total', 'count']],
+                                branches_sent, branches_received, attributes)
@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+
+from transformations.index import FILTER_FIELDS
+from transformations.ingest import CHUNK_ROWS, empty_frame, iter_chunks
+
+# Partial edge sums are re-grouped once they hold this many rows
+EDGE_COMPACT_ROWS = 1_000_000
+
+# Function to keep only the rows of each chunk matching any selected value
+
+
+def filter_chunks(chunks, selections):
+    for chunk in chunks:
+        mask = np.zeros(len(chunk), dtype=bool)
+        for field, values in selections.items():
+            if not values:
+                continue
+            sender, receiver = FILTER_FIELDS[field]
+            mask |= (chunk[sender].isin(values) |
+                     chunk[receiver].isin(values)).to_numpy()
+        if mask.any():
+            yield chunk[mask]
+
+
+def _compact_edges(partials):
+    edges = pd.concat(partials, ignore_index=True)
+    return edges.groupby(['Sender Name', 'Receiver Name'], sort=False, observed=True).agg(
+        amount=('amount', 'sum'),
+        count=('count', 'sum'),
+    ).reset_index()
+
+# Function to fold totals, counts, unique accounts and (sender, receiver)
+# edge sums over a stream of chunks. Memory is bounded by the chunk size plus
+# the size of the result; the matching rows are kept only when keep_rows is set.
+
+
+def fold_aggregates(chunks, keep_rows=True):
+    transactions = 0
+    amount = 0.0
+    accounts = set()
+    edge_partials = []
+    edge_rows = 0
+    rows = []
+
+    for chunk in chunks:
+        transactions += len(chunk)
+        amount += float(chunk['Amount'].sum())
+        accounts.update(chunk['Sender Account'].unique())
+        accounts.update(chunk['Receiver Account'].unique())
+
+        partial = chunk.groupby(['Sender Name', 'Receiver Name'], sort=False, observed=True).agg(
+            amount=('Amount', 'sum'),
+            count=('Amount', 'size'),
+        ).reset_index()
+        edge_partials.append(partial)
+        edge_rows += len(partial)
+        if edge_rows > EDGE_COMPACT_ROWS:
+            edge_partials = [_compact_edges(edge_partials)]
+            edge_rows = len(edge_partials[0])
+
+        if keep_rows:
+            rows.append(chunk)
+
+    if edge_partials:
+        edges = _compact_edges(edge_partials)
+    else:
+        edges = pd.DataFrame(
+            columns=['Sender Name', 'Receiver Name', 'amount', 'count'])
+
+    return {
+        'transactions': transactions,
+        'amount': amount,
+        'accounts': len(accounts),
+        'edges': edges,
+        'rows': pd.concat(rows, ignore_index=True) if rows else None,
+    }
+
+# Function to filter a source chunk by chunk and fold the aggregates of the
+# matching rows
+
+
+def stream_selection(path, selections, columns=None, chunk_rows=CHUNK_ROWS, keep_rows=True):
+    chunks = iter_chunks(path, columns, chunk_rows)
+    return fold_aggregates(filter_chunks(chunks, selections), keep_rows=keep_rows)
+
+# Function to collect the sorted filter options of a source chunk by chunk
+
+
+def stream_filter_options(path, chunk_rows=CHUNK_ROWS):
+    columns = [column for pair in FILTER_FIELDS.values() for column in pair]
+    values = {field: set() for field in FILTER_FIELDS}
+    for chunk in iter_chunks(path, columns, chunk_rows):
+        for field, (sender, receiver) in FILTER_FIELDS.items():
+            values[field].update(chunk[sender].unique())
+            values[field].update(chunk[receiver].unique())
+    return {field: sorted(options) for field, options in values.items()}
+
+# Function to collect every transaction touching the given accounts, used to
+# compute account summaries without loading the full dataset
+
+
+def stream_account_rows(path, accounts, columns=None, chunk_rows=CHUNK_ROWS):
+    chunks = filter_chunks(iter_chunks(path, columns, chunk_rows),
+                           {'account': list(accounts)})
+    rows = list(chunks)
+    if not rows:
+        return empty_frame(columns)
+    return pd.concat(rows, ignore_index=True)
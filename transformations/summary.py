@@ -1,5 +1,7 @@
 import pandas as pd
-import streamlit as st
+
+from transformations.accounts import build_accounts
+from transformations.table import map_labels
 
 # Function to add icons based on transaction types
 
@@ -31,112 +33,181 @@ def add_purpose_icons(purpose):
     else:
         return purpose
 
-# Function to generate the summary of transactions
+SUMMARY_COLUMNS = [
+    'Account Number', 'Account Name', 'Account Type', 'Total Sent',
+    'Total Received', 'No. of Transactions Received', 'No. of Transactions Sent',
+    'Branches Involved (Sent)', 'Branches Involved (Received)'
+]
 
+# Function to return the series or frame with object index levels, unchanged
+# when they already are, so its cached index lookups are kept
 
-def summary_of_transactions(df, filtered_df):
-    summary_data = []
 
-    # Unique accounts
-    accounts = pd.unique(
-        filtered_df[['Sender Account', 'Receiver Account']].values.ravel('K'))
+def _object_levels(obj):
+    index = obj.index
+    if isinstance(index, pd.MultiIndex):
+        if all(level.dtype == object for level in index.levels):
+            return obj
+        return obj.set_axis(pd.MultiIndex.from_arrays(
+            [index.get_level_values(i).astype(object) for i in range(index.nlevels)],
+            names=index.names))
+    if index.dtype == object:
+        return obj
+    return obj.set_axis(index.astype(object))
 
-    for account in accounts:
-        account_type = df.loc[df['Sender Account']
-                              == account, 'Sender Account Type'].values
-        account_name = df.loc[df['Sender Account']
-                              == account, 'Sender Name'].values
-
-        if len(account_type) == 0:
-            account_type = df.loc[df['Receiver Account']
-                                  == account, 'Receiver Account Type'].values
-            account_name = df.loc[df['Receiver Account']
-                                  == account, 'Receiver Name'].values
-
-        account_type = account_type[0] if len(account_type) > 0 else 'Unknown'
-        account_name = account_name[0] if len(account_name) > 0 else 'Unknown'
-
-        sent_transactions = df[df['Sender Account'] == account]
-        received_transactions = df[df['Receiver Account'] == account]
-
-        total_sent = sent_transactions['Amount'].sum()
-        total_received = received_transactions['Amount'].sum()
-
-        number_of_transactions_received = received_transactions.shape[0]
-        number_of_transactions_sent = sent_transactions.shape[0]
-
-        branches_involved_sent = sent_transactions.groupby('Receiver Account Branch')[
-            'Amount'].sum().to_dict() if len(sent_transactions) > 0 else '-'
-        branches_involved_received = received_transactions.groupby('Sender Account Branch')[
-            'Amount'].sum().to_dict() if len(received_transactions) > 0 else '-'
-
-        summary_data.append({
-            'Account Number': account,
-            'Account Name': account_name,
-            'Account Type': account_type,
-            'Total Sent': total_sent,
-            'Total Received': total_received,
-            'No. of Transactions Received': number_of_transactions_received,
-            'No. of Transactions Sent': number_of_transactions_sent,
-            'Branches Involved (Sent)': branches_involved_sent,
-            'Branches Involved (Received)': branches_involved_received,
-        })
-
-    summary_df = pd.DataFrame(summary_data)
-
-    # Ensure columns exist before applying transformations
-    if 'Total Sent' in summary_df.columns:
-        summary_df['Total Sent'] = summary_df['Total Sent'].apply(
-            lambda x: f'💸 {x}')
-    else:
-        st.error("Column 'Total Sent' not found in DataFrame")
+# Function to collect {account: {branch: amount}} from a grouped amount series.
+# Branches are sorted by value, categorical levels would sort in category order.
 
-    if 'Total Received' in summary_df.columns:
-        summary_df['Total Received'] = summary_df['Total Received'].apply(
-            lambda x: f'💰 {x}')
-    else:
-        st.error("Column 'Total Received' not found in DataFrame")
 
-    if 'No. of Transactions Received' in summary_df.columns:
-        summary_df['No. of Transactions Received'] = summary_df['No. of Transactions Received'].apply(
-            lambda x: f'📥 {x}')
-    else:
-        st.error("Column 'No. of Transactions Received' not found in DataFrame")
+def _branch_breakdown(grouped):
+    breakdown = {}
+    for (account, branch), amount in _object_levels(grouped).sort_index().items():
+        breakdown.setdefault(account, {})[branch] = amount
+    return breakdown
+
+# Function to compute the totals and counts of one side (0 sent, 1 received)
+# by account, and the amounts by account and counterparty branch
+
+
+def _side_totals(df, side):
+    account = ('Sender Account', 'Receiver Account')[side]
+    branch = ('Receiver Account Branch', 'Sender Account Branch')[side]
+    stats = df.groupby(account, sort=False, observed=True).agg(
+        total=('Amount', 'sum'),
+        count=('Amount', 'size'))
+    branches = df.groupby([account, branch], observed=True)['Amount'].sum()
+    return _object_levels(stats), _object_levels(branches)
+
+# Function to compute the totals the summary of every account is built from.
+# IncrementalDataset keeps them per version and folds each appended batch in,
+# so summaries of the loaded data look accounts up instead of scanning rows.
+
+
+def account_totals(df):
+    sent, branches_sent = _side_totals(df, 0)
+    received, branches_received = _side_totals(df, 1)
+    return {
+        'sent': sent,
+        'received': received,
+        'branches_sent': branches_sent,
+        'branches_received': branches_received,
+    }
+
+# Function to add the totals of a batch to the totals, returning new ones
+
+
+def fold_account_totals(totals, batch_totals):
+    folded = {key: totals[key].add(batch_totals[key], fill_value=0) for key in totals}
+    for key in ('sent', 'received'):
+        folded[key] = folded[key].astype({'count': 'int64'})
+    return folded
+
+# Function to compute per-account totals, counts, attributes and branch
+# breakdowns for the given accounts over the full dataset. Names and types are
+# looked up in the account dimension, which is built from the rows of these
+# accounts when none is given.
+
+
+def account_summary(df, accounts, dimension=None):
+    accounts = pd.Index(pd.unique(pd.Series(accounts, dtype=object)))
+
+    sent = df[df['Sender Account'].isin(accounts)]
+    received = df[df['Receiver Account'].isin(accounts)]
+    if dimension is None:
+        dimension = build_accounts(pd.concat([sent, received]))
+
+    sent_stats, branches_sent = _side_totals(sent, 0)
+    received_stats, branches_received = _side_totals(received, 1)
+    return assemble_summary(accounts, sent_stats, received_stats,
+                            branches_sent, branches_received, dimension)
+
+# Function to compute the same summary from the account_totals of the full
+# dataset
+
+
+def totals_summary(totals, accounts, dimension):
+    accounts = pd.Index(pd.unique(pd.Series(accounts, dtype=object)))
+    branches_sent = totals['branches_sent']
+    branches_received = totals['branches_received']
+    return assemble_summary(
+        accounts, totals['sent'], totals['received'],
+        branches_sent[branches_sent.index.get_level_values(0).isin(accounts)],
+        branches_received[branches_received.index.get_level_values(0).isin(accounts)],
+        dimension)
+
+# Function to build the summary frame from per-side stats indexed by account
+# (total, count), (account, branch) amount series and the name and type of
+# each account indexed by account
 
-    if 'No. of Transactions Sent' in summary_df.columns:
-        summary_df['No. of Transactions Sent'] = summary_df['No. of Transactions Sent'].apply(
-            lambda x: f'📤 {x}')
-    else:
-        st.error("Column 'No. of Transactions Sent' not found in DataFrame")
 
-    # Convert branch involvement dictionaries to JSON strings
-    if 'Branches Involved (Sent)' in summary_df.columns:
-        summary_df['Branches Involved (Sent)'] = summary_df['Branches Involved (Sent)'].apply(
-            lambda x: str(x) if isinstance(x, dict) else x)
-    else:
-        st.error("Column 'Branches Involved (Sent)' not found in DataFrame")
+def assemble_summary(accounts, sent_stats, received_stats, branches_sent, branches_received,
+                     attributes):
+    accounts = pd.Index(pd.unique(pd.Series(accounts, dtype=object)))
+
+    sent_stats = _object_levels(sent_stats).reindex(accounts)
+    received_stats = _object_levels(received_stats).reindex(accounts)
+    attributes = attributes.reindex(accounts)
+
+    account_name = attributes['name'].fillna('Unknown')
+    account_type = attributes['type'].fillna('Unknown')
+
+    branches_sent = _branch_breakdown(branches_sent)
+    branches_received = _branch_breakdown(branches_received)
 
-    if 'Branches Involved (Received)' in summary_df.columns:
-        summary_df['Branches Involved (Received)'] = summary_df['Branches Involved (Received)'].apply(
+    summary_df = pd.DataFrame({
+        'Account Number': accounts.to_numpy(dtype=object),
+        'Account Name': account_name.to_numpy(dtype=object),
+        'Account Type': account_type.to_numpy(dtype=object),
+        'Total Sent': sent_stats['total'].fillna(0).to_numpy(dtype='float64'),
+        'Total Received': received_stats['total'].fillna(0).to_numpy(dtype='float64'),
+        'No. of Transactions Received': received_stats['count'].fillna(0).to_numpy(dtype='int64'),
+        'No. of Transactions Sent': sent_stats['count'].fillna(0).to_numpy(dtype='int64'),
+        'Branches Involved (Sent)': [branches_sent.get(account, '-') for account in accounts],
+        'Branches Involved (Received)': [branches_received.get(account, '-') for account in accounts],
+    }, columns=SUMMARY_COLUMNS)
+    return summary_df
+
+# Function to list the unique accounts on either side of the filtered rows
+
+
+def involved_accounts(filtered_df):
+    return pd.unique(
+        filtered_df[['Sender Account', 'Receiver Account']].values.ravel('K'))
+
+# Function to format the summary values for display, with icons and the
+# branch dictionaries as strings
+
+
+def format_summary(summary_df):
+    summary_df = summary_df.copy()
+
+    summary_df['Total Sent'] = '💸 ' + summary_df['Total Sent'].astype(str)
+    summary_df['Total Received'] = '💰 ' + \
+        summary_df['Total Received'].astype(str)
+    summary_df['No. of Transactions Received'] = '📥 ' + \
+        summary_df['No. of Transactions Received'].astype(str)
+    summary_df['No. of Transactions Sent'] = '📤 ' + \
+        summary_df['No. of Transactions Sent'].astype(str)
+
+    # Convert branch involvement dictionaries to strings
+    for column in ['Branches Involved (Sent)', 'Branches Involved (Received)']:
+        summary_df[column] = summary_df[column].map(
             lambda x: str(x) if isinstance(x, dict) else x)
-    else:
-        st.error("Column 'Branches Involved (Received)' not found in DataFrame")
+    return summary_df
 
-    st.subheader('Summary of Transactions')
-    st.dataframe(summary_df)
 
+TRANSACTION_COLUMNS = [
+    'ID', 'Sender Account', 'Sender Name', 'Receiver Account', 'Receiver Name', 'Amount', 'Date and Time',
+    'Transaction Type', 'Purpose of Transaction'
+]
 
-def transactions(df):
-    st.subheader('Detailed Transactions List')
-    df = df[[
-        'ID', 'Sender Account', 'Sender Name', 'Receiver Account', 'Receiver Name', 'Amount', 'Date and Time',
-        'Transaction Type', 'Purpose of Transaction'
-    ]].copy()
+# Function to add icons to the transaction types and purposes, once per category
 
-    # Apply icons to transaction types and purposes
-    df.loc[:, 'Transaction Type'] = df['Transaction Type'].apply(
-        add_transaction_type_icons)
-    df.loc[:, 'Purpose of Transaction'] = df['Purpose of Transaction'].apply(
-        add_purpose_icons)
 
-    st.dataframe(df)
+def label_transactions(df):
+    df = df[TRANSACTION_COLUMNS].copy()
+    df['Transaction Type'] = map_labels(
+        df['Transaction Type'], add_transaction_type_icons)
+    df['Purpose of Transaction'] = map_labels(
+        df['Purpose of Transaction'], add_purpose_icons)
+    return df
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+# Server-side table paging: search, sort and slice run on the full frame, and
+# only the visible page is formatted and sent to the browser
+PAGE_SIZES = [25, 50, 100, 250]
+
+# Function to return the rows where any of the columns contains the query,
+# case-insensitively. Categorical columns are matched once per category.
+
+
+def search_rows(df, query, columns=None):
+    query = (query or '').strip().lower()
+    if not query or not len(df):
+        return df
+    mask = np.zeros(len(df), dtype=bool)
+    for column in columns or df.columns:
+        series = df[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            categories = series.cat.categories.astype(str).str.lower()
+            hits = np.flatnonzero(categories.str.contains(query, regex=False))
+            mask |= np.isin(series.cat.codes.to_numpy(), hits)
+        else:
+            mask |= series.astype(str).str.lower().str.contains(
+                query, regex=False).to_numpy()
+    return df[mask]
+
+# Function to return a sort key for the column. Categories are ranked by their
+# values rather than by their order of appearance.
+
+
+def _sort_key(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        ranks = np.argsort(np.argsort(series.cat.categories.astype(str), kind='stable'))
+        codes = series.cat.codes.to_numpy()
+        return pd.Series(np.where(codes >= 0, ranks[codes], np.nan), index=series.index)
+    if series.dtype == object:
+        return series.astype(str)
+    return series
+
+
+def sort_rows(df, column=None, ascending=True):
+    if column is None or column not in df.columns or not len(df):
+        return df
+    key = _sort_key(df[column]).reset_index(drop=True)
+    order = key.sort_values(ascending=ascending, kind='stable').index.to_numpy()
+    return df.take(order)
+
+# Function to return the rows of the 1-based page, with the page clamped to
+# the available range, and the number of pages
+
+
+def page_rows(df, page, page_size):
+    pages = max(1, -(-len(df) // page_size))
+    page = min(max(1, int(page)), pages)
+    start = (page - 1) * page_size
+    return df.iloc[start:start + page_size], page, pages
+
+# Function to label a column through a category-to-label map, calling label
+# once per distinct value instead of once per row
+
+
+def map_labels(series, label):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        labels = np.array([label(value) for value in series.cat.categories] + [np.nan],
+                          dtype=object)
+        # Missing values have code -1, which picks the trailing NaN
+        return pd.Series(labels[series.cat.codes.to_numpy()], index=series.index)
+    values, uniques = pd.factorize(series)
+    labels = np.array([label(value) for value in uniques] + [np.nan], dtype=object)
+    return pd.Series(labels[values], index=series.index)
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+# Function to build the time layout of the frame: the row order sorted by
+# 'Date and Time' and the rank of every row in that order. Built once per
+# loaded source and extended as rows are appended.
+
+
+def build_time_index(df):
+    times = df['Date and Time'].to_numpy(dtype='datetime64[ns]')
+    order = np.argsort(times, kind='stable')
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    return {'times': times[order], 'order': order, 'rank': rank}
+
+# Function to fold the rows appended at offset into the time index. Appended
+# rows go after loaded rows with the same time, as a stable sort would put
+# them, so the result equals a rebuild.
+
+
+def extend_time_index(time_index, df, offset):
+    times = df['Date and Time'].iloc[offset:].to_numpy(dtype='datetime64[ns]')
+    order = np.argsort(times, kind='stable')
+    at = np.searchsorted(time_index['times'], times[order], 'right')
+    merged = np.insert(time_index['order'], at, order + offset)
+    rank = np.empty(len(merged), dtype=np.int64)
+    rank[merged] = np.arange(len(merged))
+    return {'times': np.insert(time_index['times'], at, times[order]),
+            'order': merged, 'rank': rank}
+
+
+def time_range(time_index):
+    times = time_index['times']
+    if not len(times):
+        return None, None
+    return pd.Timestamp(times[0]), pd.Timestamp(times[-1])
+
+# Function to find the sorted-order bounds of the window [start, end] with a
+# binary search. A date end covers that whole day.
+
+
+def window_bounds(time_index, start=None, end=None):
+    times = time_index['times']
+    lo = 0 if start is None else np.searchsorted(times, np.datetime64(pd.Timestamp(start)))
+    if end is None:
+        hi = len(times)
+    else:
+        end = pd.Timestamp(end)
+        if end == end.normalize():
+            end += pd.Timedelta(days=1)
+            hi = np.searchsorted(times, np.datetime64(end), 'left')
+        else:
+            hi = np.searchsorted(times, np.datetime64(end), 'right')
+    return lo, hi
+
+# Function to keep the given row positions that fall in the window
+
+
+def restrict_to_window(time_index, positions, start=None, end=None):
+    lo, hi = window_bounds(time_index, start, end)
+    rank = time_index['rank'][positions]
+    return positions[(rank >= lo) & (rank < hi)]
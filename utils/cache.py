@@ -0,0 +1,145 @@
+import functools
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+_MISSING = object()
+
+# Function to fingerprint a filter selection on a dataset version, with the
+# options it was expanded or limited with. Values are sorted so the same
+# selection made in a different order shares entries.
+
+
+def selection_fingerprint(version, selections, options=None):
+    payload = json.dumps(
+        [version, {field: sorted(map(str, values))
+                   for field, values in sorted(selections.items())},
+         options or {}],
+        ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+# Function to estimate the bytes of nested dicts and lists such as the trace
+# properties of a figure: arrays by their buffers, strings by their length and
+# any other item as one 8-byte value
+
+
+def _nested_bytes(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_nested_bytes(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        if value and isinstance(value[0], (dict, list, tuple, np.ndarray)):
+            return sum(_nested_bytes(item) for item in value)
+        return 8 * len(value) + sum(len(item) for item in value if isinstance(item, str))
+    return 8
+
+# Function to estimate the memory held by a cached value from the buffers of
+# its frames and arrays, without serializing it. Figures are measured from the
+# property dicts plotly keeps for their traces and layout.
+
+
+def sizeof(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(np.sum(value.memory_usage(index=True, deep=False)))
+    if isinstance(value, go.Figure):
+        return _nested_bytes(value._data) + _nested_bytes(value._layout)
+    if isinstance(value, (np.ndarray, str, bytes)):
+        return _nested_bytes(value)
+    if isinstance(value, dict):
+        return sum(sizeof(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(sizeof(item) for item in value)
+    if value is None or isinstance(value, (bool, int, float)):
+        return 0
+    # Other objects, like a pyvis network, by the lists and dicts they hold
+    return _nested_bytes(getattr(value, '__dict__', {}))
+
+
+class LRUCache:
+    # Bounded by entry count and by the estimated size of the stored values
+
+    def __init__(self, max_entries=256, max_bytes=512 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        size = sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self._entries and (len(self._entries) > self.max_entries
+                                     or self.bytes > self.max_bytes):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_build(self, key, builder, *args, **kwargs):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = builder(*args, **kwargs)
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+            }
+
+    # Decorator for builders that take a frame. Callers pass cache_key, the
+    # selection fingerprint of that frame, instead of the frame being hashed;
+    # without a cache_key the builder runs uncached. Other frames and series
+    # passed, like the account dimension or pre-aggregated counts, must also be
+    # fixed by the cache_key.
+    def memoize(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, cache_key=None, **kwargs):
+            if cache_key is None:
+                return func(*args, **kwargs)
+            key = (func.__module__, func.__qualname__, cache_key,
+                   tuple(arg for arg in args if not isinstance(arg, (pd.DataFrame, pd.Series))),
+                   tuple(sorted((name, value) for name, value in kwargs.items()
+                                if not isinstance(value, (pd.DataFrame, pd.Series)))))
+            return self.get_or_build(key, func, *args, **kwargs)
+        return wrapper
+
+# Process-wide cache shared by the chart builders of all sessions
+chart_cache = LRUCache()
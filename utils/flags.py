@@ -0,0 +1,15 @@
+import os
+
+# Values of an environment variable or query parameter that turn a flag on
+TRUE_VALUES = ('1', 'true', 'yes')
+
+# Function to tell whether a feature is turned on by its environment variable,
+# for the whole server, or by its query parameter, for one session
+
+
+def flag_enabled(env, param, query_params=None):
+    if os.environ.get(env, '').lower() in TRUE_VALUES:
+        return True
+    if query_params is not None:
+        return str(query_params.get(param, '')).lower() in TRUE_VALUES
+    return False
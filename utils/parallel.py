@@ -0,0 +1,55 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.flags import flag_enabled
+
+# Panels are built concurrently with PARALLEL_PANELS=1 or ?parallel=1. Threads
+# are used rather than processes so the filtered frame is shared instead of
+# pickled to every worker; pandas and numpy release the GIL in their kernels.
+PARALLEL_ENV = 'PARALLEL_PANELS'
+WORKERS_ENV = 'PANEL_WORKERS'
+# With DEFERRED_PANELS=1 or ?deferred=1 the map, ego graph, timelines and
+# summary are behind a panel picker and only the opened one is built
+DEFERRED_ENV = 'DEFERRED_PANELS'
+
+_executor = None
+
+
+def parallel_enabled(query_params=None):
+    return flag_enabled(PARALLEL_ENV, 'parallel', query_params)
+
+
+def deferred_enabled(query_params=None):
+    return flag_enabled(DEFERRED_ENV, 'deferred', query_params)
+
+
+def get_executor():
+    # One pool per process, shared by all sessions
+    global _executor
+    if _executor is None:
+        workers = int(os.environ.get(WORKERS_ENV, min(8, os.cpu_count() or 1)))
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='panel')
+    return _executor
+
+
+class PanelBuilder:
+    # Builders are submitted in any order and their results taken in layout
+    # order. In parallel mode they start on the pool immediately, otherwise
+    # each one runs when its result is first requested.
+
+    def __init__(self, parallel=False):
+        self.parallel = parallel
+        self._tasks = {}
+
+    def submit(self, name, func, *args, **kwargs):
+        if self.parallel:
+            self._tasks[name] = get_executor().submit(func, *args, **kwargs)
+        else:
+            self._tasks[name] = (func, args, kwargs)
+
+    def result(self, name):
+        task = self._tasks[name]
+        if self.parallel:
+            return task.result()
+        func, args, kwargs = task
+        return func(*args, **kwargs)
@@ -0,0 +1,99 @@
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+import plotly.graph_objects as go
+
+from utils.cache import chart_cache, sizeof
+from utils.flags import flag_enabled
+
+# Records are logged as one JSON line each to stderr. The logger has its own
+# handler and level, so they are not dropped under the default WARNING level.
+logger = logging.getLogger('dashboard.profile')
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+# Profiling is enabled with DASHBOARD_PROFILE=1 or the ?profile=1 query
+# parameter; records are appended as JSON lines to PROFILE_LOG when it is set.
+PROFILE_ENV = 'DASHBOARD_PROFILE'
+PROFILE_LOG_ENV = 'PROFILE_LOG'
+
+
+def profiling_enabled(query_params=None):
+    return flag_enabled(PROFILE_ENV, 'profile', query_params)
+
+# Function to measure the payload a stage sends to the browser. Profiling is
+# opt-in, so figures are serialized and frames measured with their strings to
+# get their real size.
+
+
+def payload_size(payload):
+    if isinstance(payload, go.Figure):
+        return len(payload.to_json())
+    if isinstance(payload, pd.DataFrame):
+        return int(payload.memory_usage(index=True, deep=True).sum())
+    if isinstance(payload, str):
+        return len(payload.encode('utf-8'))
+    if isinstance(payload, dict):
+        return sum(payload_size(item) for item in payload.values())
+    if isinstance(payload, (list, tuple)):
+        return sum(payload_size(item) for item in payload)
+    return sizeof(payload)
+
+
+class Profiler:
+    # Collects one record per stage of a script run
+
+    def __init__(self, enabled=False, log_path=None, started=None):
+        self.enabled = enabled
+        self.log_path = log_path or os.environ.get(PROFILE_LOG_ENV)
+        # perf_counter() at the top of the script, marks are timed from it
+        self.started = time.perf_counter() if started is None else started
+        self.records = []
+
+    # Times the wrapped block. The block may set 'rows_out' and 'payload' on
+    # the yielded record; the payload (a figure, frame or HTML) is measured
+    # on exit and not kept.
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        record = {'stage': name, 'rows_in': rows_in}
+        if not self.enabled:
+            yield record
+            return
+
+        hits, misses = chart_cache.hits, chart_cache.misses
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            payload = record.pop('payload', None)
+            if payload is not None:
+                record['payload_bytes'] = payload_size(payload)
+            record['cache_hits'] = chart_cache.hits - hits
+            record['cache_misses'] = chart_cache.misses - misses
+            self.records.append(record)
+
+    # Records the time since the start of the script run, e.g. the time to
+    # first render. On a cold start it includes the imports.
+    def mark(self, name):
+        if self.enabled:
+            self.records.append(
+                {'stage': name, 'seconds': time.perf_counter() - self.started})
+
+    def flush(self, **context):
+        if not self.enabled or not self.records:
+            return
+        for record in self.records:
+            entry = dict(context, **record)
+            logger.info(json.dumps(entry, default=str))
+            if self.log_path:
+                with open(self.log_path, 'a', encoding='utf-8') as file:
+                    file.write(json.dumps(entry, default=str) + '\n')